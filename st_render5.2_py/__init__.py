@@ -9,12 +9,13 @@ __version__ = "5.2.0"
 __author__ = "Converted to Python from C++ version by @linsanyi031"
 
 from .hsd_reader import hsd_read, HSData
-from .calibration import hsd_calibration, goes_calibration
+from .calibration import hsd_calibration, hsd_temperature_lut, goes_calibration
 from .colorscale import (
     bw_scale,
     bd_scale,
     color2_scale,
-    wvnrl_scale
+    wvnrl_scale,
+    scale_by_lut
 )
 
 try:
@@ -27,11 +28,13 @@ __all__ = [
     'hsd_read',
     'HSData',
     'hsd_calibration',
+    'hsd_temperature_lut',
     'goes_calibration',
     'bw_scale',
     'bd_scale',
     'color2_scale',
     'wvnrl_scale',
+    'scale_by_lut',
     'GOES_SUPPORT',
 ]
 
@@ -1,78 +1,124 @@
 """
 データ校正モジュール（放射輝度から輝度温度への変換）
 """
+import functools
 import numpy as np
 from typing import TYPE_CHECKING
 
+try:
+    import numexpr as ne
+    HAS_NUMEXPR = True
+except ImportError:
+    HAS_NUMEXPR = False
+
 if TYPE_CHECKING:
     from .hsd_reader import HSData
     from .goes_reader import GOESData
 
 
+@functools.lru_cache(maxsize=32)
+def _build_lut(band: int, wavelength: float, slope: float, intc: float,
+               H: float, k: float, c: float) -> np.ndarray:
+    """
+    輝度温度のルックアップテーブルを計算（校正パラメータごとにキャッシュ）
+
+    同じバンドの時系列を連続で処理する場合、校正パラメータは同一のため
+    テーブルの計算は最初の1回のみ行われる
+
+    Returns:
+        輝度温度のテーブル (numpy.ndarray, shape=(65536,), 読み取り専用)
+    """
+    vals = np.arange(1 << 16, dtype=np.float64)
+    radiance = slope * vals + intc
+
+    if band <= 6:
+        lut = radiance
+    else:
+        # 波長の単位変換 (μm -> m)
+        wl = wavelength * 1e-6
+        wl5 = wl ** 5
+
+        # Planck定数関連の計算
+        hc_over_k_wl = (H * c) / (k * wl)
+        h2cc = 2 * H * c * c
+        h2cc_over_wl5 = h2cc / wl5
+        h2cc_over_wl5 *= 1e-6
+
+        # T = (hc/kλ) / ln((2hc²/λ⁵) / L + 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lut = hc_over_k_wl / np.log1p(h2cc_over_wl5 / radiance)
+
+        # 放射輝度が0以下の値は0Kに設定して、後で黒として描画される
+        lut = np.where(radiance > 0, lut, 0.0)
+
+    # 欠損値（65534, 65535, 0）も0に設定
+    lut[0] = 0.0
+    lut[65534:] = 0.0
+
+    # キャッシュを共有するため書き込みを禁止
+    lut.flags.writeable = False
+
+    return lut
+
+
+def hsd_temperature_lut(hs_data: 'HSData') -> np.ndarray:
+    """
+    16ビットのカウント値から輝度温度へのルックアップテーブルを作成
+
+    HSDの画像データはUInt16のため、全65536値について一括で計算しておけば
+    画像全体の変換は lut[data] の参照のみで済みます。
+    バンド6以下の場合は放射輝度のテーブルを返します。
+
+    Args:
+        hs_data: HSDデータ構造体
+
+    Returns:
+        輝度温度のテーブル (numpy.ndarray, shape=(65536,), 読み取り専用)
+        欠損値（65534, 65535, 0）は0
+    """
+    return _build_lut(hs_data.band, hs_data.wavelength, hs_data.slope, hs_data.intc,
+                      hs_data.H, hs_data.k, hs_data.c)
+
+
 def hsd_calibration(hs_data: 'HSData', debug: bool = False) -> np.ndarray:
     """
     HSDデータの校正（放射輝度から輝度温度への変換）
 
     Planck関数の逆関数を使用して、観測された放射輝度から輝度温度を計算します。
+    輝度温度への変換は赤外バンド（バンド7以上）のみ有効です。
+    可視・近赤外バンド（バンド6以下）はPlanck定数がヘッダーに含まれないため、
+    放射輝度 (slope * data + intc) をそのまま返します。
 
     Args:
         hs_data: HSDデータ構造体
         debug: デバッグ出力を表示するか
 
     Returns:
-        輝度温度の配列 (numpy.ndarray)
+        輝度温度の配列 (numpy.ndarray)、バンド6以下の場合は放射輝度の配列
     """
     if debug:
         print("hsdCalibration1")
 
-    # 波長の単位変換 (μm -> m)
-    wl = hs_data.wavelength * 1e-6
-    wl5 = wl ** 5
-
-    # Planck定数関連の計算
-    hc_over_k_wl = (hs_data.H * hs_data.c) / (hs_data.k * wl)
-    h2cc = 2 * hs_data.H * hs_data.c * hs_data.c
-    h2cc_over_wl5 = h2cc / wl5
-    h2cc_over_wl5 *= 1e-6
-
-    slope = hs_data.slope
-    intc = hs_data.intc
+    # 可視・近赤外バンドは放射輝度のみ計算（欠損値は0）
+    if hs_data.band <= 6:
+        radiance = hs_data.slope * hs_data.data.astype(np.float32) + hs_data.intc
+        radiance[(hs_data.data == 0) | (hs_data.data >= 65534)] = 0.0
+        hs_data.temp = radiance
+        return radiance
 
     if debug:
         print("hsdCalibration2")
+        print(f"xy: {hs_data.width * hs_data.height}")
+        print(f"data[0]: {hs_data.data.flat[0]}")
 
-    # データサイズ
-    xy = hs_data.width * hs_data.height
-
-    if debug:
-        print(f"xy: {xy}")
-        print(f"data[0]: {hs_data.data[0]}")
-
-    # ルックアップテーブルを使用して高速化
-    unique_values = np.unique(hs_data.data)
-    lookup_table = {}
-
-    for val in unique_values:
-        # 欠損値の検出（65534, 65535, 0など）
-        if val >= 65534 or val == 0:
-            # 欠損値は非常に低い温度（0K）に設定して、後で黒として描画される
-            lookup_table[val] = 0.0
-        else:
-            # 放射輝度の計算
-            radiance = slope * val + intc
-
-            # Planck関数の逆関数で輝度温度を計算
-            # T = (hc/kλ) / ln((2hc²/λ⁵) / L + 1)
-            temp = hc_over_k_wl / np.log((h2cc_over_wl5 / radiance) + 1)
-            lookup_table[val] = temp
+    # 全16ビット値に対する輝度温度のルックアップテーブルを一括計算
+    lut = hsd_temperature_lut(hs_data)
 
     if debug:
         print("hsdCalibration3")
 
     # ルックアップテーブルを使用して変換
-    temp_array = np.zeros(xy, dtype=np.float64)
-    for i, val in enumerate(hs_data.data):
-        temp_array[i] = lookup_table[val]
+    temp_array = lut[hs_data.data]
 
     if debug:
         print("hsdCalibration4")
@@ -94,19 +140,35 @@ def goes_calibration(goes_data: 'GOESData', debug: bool = False) -> np.ndarray:
     Returns:
         輝度温度の配列 (numpy.ndarray)
     """
-    # 放射輝度の計算
-    radiance = goes_data.data * goes_data.scale_factor + goes_data.add_offset
-
     # Planck関数の逆関数で輝度温度を計算
+    # L = data * scale_factor + add_offset
     # T = fk2 / ln((fk1 / L) + 1)
-    temp_array = goes_data.planck_fk2 / np.log((goes_data.planck_fk1 / radiance) + 1)
+    if HAS_NUMEXPR:
+        # 放射輝度の計算から輝度温度までを1パスで計算
+        temp_array = ne.evaluate(
+            "fk2 / log(fk1 / (d * s + o) + 1)",
+            local_dict={
+                'd': goes_data.data,
+                's': goes_data.scale_factor,
+                'o': goes_data.add_offset,
+                'fk1': goes_data.planck_fk1,
+                'fk2': goes_data.planck_fk2,
+            }
+        )
+    else:
+        # 放射輝度の配列を作業領域としてin-placeに計算
+        temp_array = goes_data.data * goes_data.scale_factor + goes_data.add_offset
+        np.divide(goes_data.planck_fk1, temp_array, out=temp_array)
+        np.add(temp_array, 1, out=temp_array)
+        np.log(temp_array, out=temp_array)
+        np.divide(goes_data.planck_fk2, temp_array, out=temp_array)
 
     # GOESDataに温度データを保存
     goes_data.temp = temp_array
 
     if debug:
         print(f"planck_fk1: {goes_data.planck_fk1}")
-        print(f"data[0]: {goes_data.data[0]}")
-        print(f"temp[0]: {temp_array[0]}")
+        print(f"data[0]: {goes_data.data.flat[0]}")
+        print(f"temp[0]: {temp_array.flat[0]}")
 
     return temp_array
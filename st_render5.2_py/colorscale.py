@@ -3,6 +3,12 @@
 """
 import numpy as np
 
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 
 def bw_scale(data: np.ndarray, bit_num: int) -> np.ndarray:
     """
@@ -13,7 +19,7 @@ def bw_scale(data: np.ndarray, bit_num: int) -> np.ndarray:
         bit_num: ビット数
 
     Returns:
-        RGB画像データ (numpy.ndarray, shape=(height, width, 3))
+        RGB画像データ (numpy.ndarray, shape=(height, width, 3), 読み取り専用ビュー)
     """
     # ビットシフト
     if bit_num > 8:
@@ -22,12 +28,16 @@ def bw_scale(data: np.ndarray, bit_num: int) -> np.ndarray:
         shift = 0
 
     # ビットシフトして8ビットに変換
-    gray = (data >> shift).astype(np.uint8)
-
-    # RGB3チャンネルに複製
-    rgb = np.stack([gray, gray, gray], axis=-1)
+    if shift == 8 and data.dtype == np.dtype('<u2') and data.flags.c_contiguous:
+        # 16ビットデータは上位バイトをそのまま取り出す（リトルエンディアンの奇数バイト）
+        gray = np.ascontiguousarray(data.view(np.uint8)[..., 1::2])
+    else:
+        # UInt16の中間配列を作らず、UInt8の出力へ直接書き込む
+        gray = np.empty(data.shape, dtype=np.uint8)
+        np.right_shift(data, shift, out=gray, casting='unsafe')
 
-    return rgb
+    # RGB3チャンネルに複製（コピーせずブロードキャストしたビューを返す）
+    return np.broadcast_to(gray[..., None], gray.shape + (3,))
 
 
 def bd_scale_value(temp: float) -> int:
@@ -62,6 +72,234 @@ def bd_scale_value(temp: float) -> int:
         return 120
 
 
+# 区分線形カラースケールの定義
+# 各区間は低温側から (上端温度, 基準温度, 係数, 加算値) の順に並べ、
+# 区間内の値は (基準温度 - T) * 係数 + 加算値 で計算する（定数区間は係数0）
+_BD_SEGMENTS = (
+    (192.15, 0.0, 0.0, 120.0),
+    (197.15, 0.0, 0.0, 170.0),
+    (203.15, 0.0, 0.0, 255.0),
+    (209.15, 0.0, 0.0, 0.0),
+    (219.15, 0.0, 0.0, 190.0),
+    (231.15, 0.0, 0.0, 130.0),
+    (242.15, 0.0, 0.0, 80.0),
+    (282.15, 282.15, 2.0, 100.0),
+    (303.15, 303.15, 12.0, 0.0),
+    (np.inf, 0.0, 0.0, 0.0),
+)
+
+_COLOR2_R_SEGMENTS = (
+    (183.15, 173.15, -25.0, 0.0),
+    (193.15, 183.15, -25.0, 0.0),
+    (203.15, 203.15, 15.0, 100.0),
+    (223.15, 0.0, 0.0, 0.0),
+    (243.15, 0.0, 0.0, 50.0),
+    (303.15, 303.15, 4.0, 0.0),
+    (np.inf, 0.0, 0.0, 0.0),
+)
+
+_COLOR2_G_SEGMENTS = (
+    (183.15, 173.15, -25.0, 0.0),
+    (193.15, 183.15, -25.0, 0.0),
+    (203.15, 0.0, 0.0, 0.0),
+    (213.15, 213.15, 15.0, 100.0),
+    (223.15, 0.0, 0.0, 0.0),
+    (243.15, 223.15, -6.0, 120.0),
+    (303.15, 303.15, 4.0, 0.0),
+    (np.inf, 0.0, 0.0, 0.0),
+)
+
+_COLOR2_B_SEGMENTS = (
+    (183.15, 173.15, -25.0, 0.0),
+    (213.15, 0.0, 0.0, 0.0),
+    (223.15, 223.15, 15.0, 100.0),
+    (243.15, 223.15, -6.0, 120.0),
+    (303.15, 303.15, 4.0, 0.0),
+    (np.inf, 0.0, 0.0, 0.0),
+)
+
+_WVNRL_R_SEGMENTS = (
+    (223.15, 203.15, -6.4, 127.0),
+    (233.15, 0.0, 0.0, 255.0),
+    (243.15, 127 + 243.15, 12.8, 0.0),
+    (253.15, 253.15, 7.8, 50.0),
+    (263.15, 263.15, 3.0, 20.0),
+    (273.15, 263.15, -10.8, 20.0),
+    (np.inf, 0.0, 0.0, 127.0),
+)
+
+_WVNRL_G_SEGMENTS = (
+    (223.15, 203.15, -9.0, 0.0),
+    (233.15, 223.15, -7.5, 180.0),
+    (243.15, 0.0, 0.0, 255.0),
+    (253.15, 253.15, 10.5, 150.0),
+    (263.15, 263.15, 5.0, 100.0),
+    (273.15, 273.15, 10.0, 0.0),
+    (np.inf, 0.0, 0.0, 0.0),
+)
+
+_WVNRL_B_SEGMENTS = (
+    (223.15, 203.15, -5.0, 0.0),
+    (233.15, 223.15, -2.8, 100.0),
+    (243.15, 233.15, -12.8, 127.0),
+    (253.15, 0.0, 0.0, 255.0),
+    (263.15, 263.15, 2.5, 230.0),
+    (273.15, 273.15, 9.0, 140.0),
+    (np.inf, 0.0, 0.0, 140.0),
+)
+
+
+def _build_table(segments: tuple) -> tuple:
+    """
+    区間定義を np.digitize 用の配列に変換
+
+    Args:
+        segments: (上端温度, 基準温度, 係数, 加算値) のタプル列
+
+    Returns:
+        (境界温度, 基準温度, 係数, 加算値) の配列タプル
+    """
+    upper, anchor, scale, base = (np.array(col, dtype=np.float64) for col in zip(*segments))
+    return upper[:-1], anchor, scale, base
+
+
+_BD_TABLE = _build_table(_BD_SEGMENTS)
+_COLOR2_R_TABLE = _build_table(_COLOR2_R_SEGMENTS)
+_COLOR2_G_TABLE = _build_table(_COLOR2_G_SEGMENTS)
+_COLOR2_B_TABLE = _build_table(_COLOR2_B_SEGMENTS)
+_WVNRL_R_TABLE = _build_table(_WVNRL_R_SEGMENTS)
+_WVNRL_G_TABLE = _build_table(_WVNRL_G_SEGMENTS)
+_WVNRL_B_TABLE = _build_table(_WVNRL_B_SEGMENTS)
+
+
+def _merge_tables(*tables: tuple) -> tuple:
+    """
+    チャンネルごとの区間定義を共通の境界温度でまとめる
+
+    全チャンネルの境界温度の和集合で区間を作り直し、各区間に
+    チャンネルごとの係数を割り当てることで、ビン分けを1回で済ませる
+
+    Args:
+        tables: _build_table で作成したチャンネルごとの配列タプル
+
+    Returns:
+        (境界温度, 基準温度, 係数, 加算値) の配列タプル
+        （係数類は shape=(チャンネル数, 区間数)）
+    """
+    bins = np.unique(np.concatenate([table[0] for table in tables]))
+
+    # 各共通区間の上端（最後の区間は無限大）が属するチャンネル側の区間番号
+    upper = np.append(bins, np.inf)
+    anchor, scale, base = (np.empty((len(tables), len(upper))) for _ in range(3))
+    for ch, (ch_bins, ch_anchor, ch_scale, ch_base) in enumerate(tables):
+        idx = np.digitize(upper, ch_bins, right=True)
+        anchor[ch] = ch_anchor[idx]
+        scale[ch] = ch_scale[idx]
+        base[ch] = ch_base[idx]
+
+    return bins, anchor, scale, base
+
+
+_COLOR2_TABLE = _merge_tables(_COLOR2_R_TABLE, _COLOR2_G_TABLE, _COLOR2_B_TABLE)
+_WVNRL_TABLE = _merge_tables(_WVNRL_R_TABLE, _WVNRL_G_TABLE, _WVNRL_B_TABLE)
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _piecewise_kernel(temp, bins, anchor, scale, base, out):
+        """
+        区分線形カラースケールのNumbaカーネル（1画素ずつ分岐して出力へ直接書き込む）
+
+        Args:
+            temp: 輝度温度配列 (1次元)
+            bins: 境界温度
+            anchor, scale, base: 係数 (shape=(チャンネル数, 区間数))
+            out: 出力配列 (shape=(画素数, チャンネル数), UInt8)
+        """
+        n_bins = bins.size
+        n_ch = out.shape[1]
+        for i in prange(temp.size):
+            t = temp[i]
+
+            # 欠損値（0K）は黒
+            if not t > 0:
+                for ch in range(n_ch):
+                    out[i, ch] = 0
+                continue
+
+            idx = 0
+            while idx < n_bins and t > bins[idx]:
+                idx += 1
+
+            for ch in range(n_ch):
+                v = (anchor[ch, idx] - t) * scale[ch, idx] + base[ch, idx]
+                out[i, ch] = np.uint8(int(v) & 0xFF)
+
+
+def _piecewise_scale(temp_array: np.ndarray, table: tuple) -> np.ndarray:
+    """
+    区分線形カラースケールを1回のビン分けで適用
+
+    Args:
+        temp_array: 輝度温度配列 (K)
+        table: _build_table で作成した配列タプル
+
+    Returns:
+        チャンネル値 (0-255のUInt8)
+    """
+    bins, anchor, scale, base = table
+
+    if HAS_NUMBA:
+        result = np.empty(temp_array.shape, dtype=np.uint8)
+        _piecewise_kernel(np.ravel(temp_array), bins, anchor[None], scale[None], base[None],
+                          result.reshape(-1, 1))
+        return result
+
+    # 各画素が属する区間番号（区間は下端を含まず上端を含む）
+    idx = np.digitize(temp_array, bins, right=True)
+
+    with np.errstate(invalid='ignore'):
+        result = ((anchor[idx] - temp_array) * scale[idx] + base[idx]).astype(np.uint8)
+
+    # 欠損値（0K）は黒（有効マスクとの積で1パスで0にする）
+    np.multiply(result, temp_array > 0, out=result)
+
+    return result
+
+
+def _piecewise_rgb(temp_array: np.ndarray, table: tuple) -> np.ndarray:
+    """
+    3チャンネルの区分線形カラースケールを1回のビン分けで適用
+
+    Args:
+        temp_array: 輝度温度配列 (K)
+        table: _merge_tables で作成した配列タプル
+
+    Returns:
+        RGB画像データ (numpy.ndarray, shape=(..., 3))
+    """
+    bins, anchor, scale, base = table
+
+    if HAS_NUMBA:
+        rgb = np.empty(temp_array.shape + (3,), dtype=np.uint8)
+        _piecewise_kernel(np.ravel(temp_array), bins, anchor, scale, base, rgb.reshape(-1, 3))
+        return rgb
+
+    # 区間番号は3チャンネルで共有する
+    idx = np.digitize(temp_array, bins, right=True)
+
+    rgb = np.empty(temp_array.shape + (3,), dtype=np.uint8)
+    with np.errstate(invalid='ignore'):
+        for ch in range(3):
+            rgb[..., ch] = (anchor[ch][idx] - temp_array) * scale[ch][idx] + base[ch][idx]
+
+    # 欠損値（0K）は黒（有効マスクは3チャンネルで共有し、積で1パスで0にする）
+    valid = temp_array > 0
+    np.multiply(rgb, valid[..., None], out=rgb)
+
+    return rgb
+
+
 def bd_scale(temp_array: np.ndarray) -> np.ndarray:
     """
     BDカラースケール変換（配列処理）
@@ -70,99 +308,27 @@ def bd_scale(temp_array: np.ndarray) -> np.ndarray:
         temp_array: 輝度温度配列 (K)
 
     Returns:
-        RGB画像データ (numpy.ndarray, shape=(height, width, 3))
+        RGB画像データ (numpy.ndarray, shape=(height, width, 3), 読み取り専用ビュー)
     """
-    # ベクトル化した条件分岐
-    result = np.zeros(len(temp_array), dtype=np.uint8)
-
-    # 欠損値（0K）は黒のまま
-    valid_mask = temp_array > 0
-
-    result[valid_mask & (temp_array > 303.15)] = 0
-    mask = valid_mask & (temp_array > 282.15) & (temp_array <= 303.15)
-    result[mask] = ((303.15 - temp_array[mask]) * 12).astype(np.uint8)
-    mask = valid_mask & (temp_array > 242.15) & (temp_array <= 282.15)
-    result[mask] = ((282.15 - temp_array[mask]) * 2 + 100).astype(np.uint8)
-    result[valid_mask & (temp_array > 231.15) & (temp_array <= 242.15)] = 80
-    result[valid_mask & (temp_array > 219.15) & (temp_array <= 231.15)] = 130
-    result[valid_mask & (temp_array > 209.15) & (temp_array <= 219.15)] = 190
-    result[valid_mask & (temp_array > 203.15) & (temp_array <= 209.15)] = 0
-    result[valid_mask & (temp_array > 197.15) & (temp_array <= 203.15)] = 255
-    result[valid_mask & (temp_array > 192.15) & (temp_array <= 197.15)] = 170
-    mask = valid_mask & (temp_array <= 192.15)
-    result[mask] = 120
-
-    # RGB3チャンネルに複製
-    rgb = np.stack([result, result, result], axis=-1)
+    result = _piecewise_scale(temp_array, _BD_TABLE)
 
-    return rgb
+    # RGB3チャンネルに複製（コピーせずブロードキャストしたビューを返す）
+    return np.broadcast_to(result[..., None], result.shape + (3,))
 
 
 def color2_r(temp_array: np.ndarray) -> np.ndarray:
     """Color2スケール - 赤チャンネル"""
-    result = np.zeros(len(temp_array), dtype=np.uint8)
-
-    # 欠損値（0K）は黒のまま
-    valid_mask = temp_array > 0
-
-    result[valid_mask & (temp_array > 303.15)] = 0
-    mask = valid_mask & (temp_array > 243.15) & (temp_array <= 303.15)
-    result[mask] = ((303.15 - temp_array[mask]) * 4).astype(np.uint8)
-    result[valid_mask & (temp_array > 223.15) & (temp_array <= 243.15)] = 50
-    result[valid_mask & (temp_array > 203.15) & (temp_array <= 223.15)] = 0
-    mask = valid_mask & (temp_array > 193.15) & (temp_array <= 203.15)
-    result[mask] = ((203.15 - temp_array[mask]) * 15 + 100).astype(np.uint8)
-    mask = valid_mask & (temp_array > 183.15) & (temp_array <= 193.15)
-    result[mask] = ((temp_array[mask] - 183.15) * 25).astype(np.uint8)
-    mask = valid_mask & (temp_array <= 183.15)
-    result[mask] = ((temp_array[mask] - 173.15) * 25).astype(np.uint8)
-
-    return result
+    return _piecewise_scale(temp_array, _COLOR2_R_TABLE)
 
 
 def color2_g(temp_array: np.ndarray) -> np.ndarray:
     """Color2スケール - 緑チャンネル"""
-    result = np.zeros(len(temp_array), dtype=np.uint8)
-
-    # 欠損値（0K）は黒のまま
-    valid_mask = temp_array > 0
-
-    result[valid_mask & (temp_array > 303.15)] = 0
-    mask = valid_mask & (temp_array > 243.15) & (temp_array <= 303.15)
-    result[mask] = ((303.15 - temp_array[mask]) * 4).astype(np.uint8)
-    mask = valid_mask & (temp_array > 223.15) & (temp_array <= 243.15)
-    result[mask] = ((temp_array[mask] - 223.15) * 6 + 120).astype(np.uint8)
-    result[valid_mask & (temp_array > 213.15) & (temp_array <= 223.15)] = 0
-    mask = valid_mask & (temp_array > 203.15) & (temp_array <= 213.15)
-    result[mask] = ((213.15 - temp_array[mask]) * 15 + 100).astype(np.uint8)
-    result[valid_mask & (temp_array > 193.15) & (temp_array <= 203.15)] = 0
-    mask = valid_mask & (temp_array > 183.15) & (temp_array <= 193.15)
-    result[mask] = ((temp_array[mask] - 183.15) * 25).astype(np.uint8)
-    mask = valid_mask & (temp_array <= 183.15)
-    result[mask] = ((temp_array[mask] - 173.15) * 25).astype(np.uint8)
-
-    return result
+    return _piecewise_scale(temp_array, _COLOR2_G_TABLE)
 
 
 def color2_b(temp_array: np.ndarray) -> np.ndarray:
     """Color2スケール - 青チャンネル"""
-    result = np.zeros(len(temp_array), dtype=np.uint8)
-
-    # 欠損値（0K）は黒のまま
-    valid_mask = temp_array > 0
-
-    result[valid_mask & (temp_array > 303.15)] = 0
-    mask = valid_mask & (temp_array > 243.15) & (temp_array <= 303.15)
-    result[mask] = ((303.15 - temp_array[mask]) * 4).astype(np.uint8)
-    mask = valid_mask & (temp_array > 223.15) & (temp_array <= 243.15)
-    result[mask] = ((temp_array[mask] - 223.15) * 6 + 120).astype(np.uint8)
-    mask = valid_mask & (temp_array > 213.15) & (temp_array <= 223.15)
-    result[mask] = ((223.15 - temp_array[mask]) * 15 + 100).astype(np.uint8)
-    result[valid_mask & (temp_array > 183.15) & (temp_array <= 213.15)] = 0
-    mask = valid_mask & (temp_array <= 183.15)
-    result[mask] = ((temp_array[mask] - 173.15) * 25).astype(np.uint8)
-
-    return result
+    return _piecewise_scale(temp_array, _COLOR2_B_TABLE)
 
 
 def color2_scale(temp_array: np.ndarray) -> np.ndarray:
@@ -175,83 +341,22 @@ def color2_scale(temp_array: np.ndarray) -> np.ndarray:
     Returns:
         RGB画像データ (numpy.ndarray, shape=(height, width, 3))
     """
-    r = color2_r(temp_array)
-    g = color2_g(temp_array)
-    b = color2_b(temp_array)
-
-    rgb = np.stack([r, g, b], axis=-1)
-
-    return rgb
+    return _piecewise_rgb(temp_array, _COLOR2_TABLE)
 
 
 def wvnrl_r(temp_array: np.ndarray) -> np.ndarray:
     """水蒸気カラースケール - 赤チャンネル"""
-    result = np.full(len(temp_array), 128, dtype=np.uint8)
-
-    # 欠損値（0K）は黒
-    valid_mask = temp_array > 0
-    result[~valid_mask] = 0
-
-    result[valid_mask & (temp_array > 273.15)] = 127
-    mask = valid_mask & (temp_array > 263.15) & (temp_array <= 273.15)
-    result[mask] = ((temp_array[mask] - 263.15) * 10.8 + 20).astype(np.uint8)
-    mask = valid_mask & (temp_array > 253.15) & (temp_array <= 263.15)
-    result[mask] = (20 + (263.15 - temp_array[mask]) * 3).astype(np.uint8)
-    mask = valid_mask & (temp_array > 243.15) & (temp_array <= 253.15)
-    result[mask] = (50 + (253.15 - temp_array[mask]) * 7.8).astype(np.uint8)
-    mask = valid_mask & (temp_array > 233.15) & (temp_array <= 243.15)
-    result[mask] = ((127 + 243.15 - temp_array[mask]) * 12.8).astype(np.uint8)
-    result[valid_mask & (temp_array > 223.15) & (temp_array <= 233.15)] = 255
-    mask = valid_mask & (temp_array <= 223.15)
-    result[mask] = (127 + (temp_array[mask] - 203.15) * 6.4).astype(np.uint8)
-
-    return result
+    return _piecewise_scale(temp_array, _WVNRL_R_TABLE)
 
 
 def wvnrl_g(temp_array: np.ndarray) -> np.ndarray:
     """水蒸気カラースケール - 緑チャンネル"""
-    result = np.zeros(len(temp_array), dtype=np.uint8)
-
-    # 欠損値（0K）は黒のまま
-    valid_mask = temp_array > 0
-
-    result[valid_mask & (temp_array > 273.15)] = 0
-    mask = valid_mask & (temp_array > 263.15) & (temp_array <= 273.15)
-    result[mask] = ((273.15 - temp_array[mask]) * 10).astype(np.uint8)
-    mask = valid_mask & (temp_array > 253.15) & (temp_array <= 263.15)
-    result[mask] = (100 + (263.15 - temp_array[mask]) * 5).astype(np.uint8)
-    mask = valid_mask & (temp_array > 243.15) & (temp_array <= 253.15)
-    result[mask] = (150 + (253.15 - temp_array[mask]) * 10.5).astype(np.uint8)
-    result[valid_mask & (temp_array > 233.15) & (temp_array <= 243.15)] = 255
-    mask = valid_mask & (temp_array > 223.15) & (temp_array <= 233.15)
-    result[mask] = (180 + (temp_array[mask] - 223.15) * 7.5).astype(np.uint8)
-    mask = valid_mask & (temp_array <= 223.15)
-    result[mask] = ((temp_array[mask] - 203.15) * 9).astype(np.uint8)
-
-    return result
+    return _piecewise_scale(temp_array, _WVNRL_G_TABLE)
 
 
 def wvnrl_b(temp_array: np.ndarray) -> np.ndarray:
     """水蒸気カラースケール - 青チャンネル"""
-    result = np.zeros(len(temp_array), dtype=np.uint8)
-
-    # 欠損値（0K）は黒のまま
-    valid_mask = temp_array > 0
-
-    result[valid_mask & (temp_array > 273.15)] = 140
-    mask = valid_mask & (temp_array > 263.15) & (temp_array <= 273.15)
-    result[mask] = (140 + (273.15 - temp_array[mask]) * 9).astype(np.uint8)
-    mask = valid_mask & (temp_array > 253.15) & (temp_array <= 263.15)
-    result[mask] = (230 + (263.15 - temp_array[mask]) * 2.5).astype(np.uint8)
-    result[valid_mask & (temp_array > 243.15) & (temp_array <= 253.15)] = 255
-    mask = valid_mask & (temp_array > 233.15) & (temp_array <= 243.15)
-    result[mask] = (127 + (temp_array[mask] - 233.15) * 12.8).astype(np.uint8)
-    mask = valid_mask & (temp_array > 223.15) & (temp_array <= 233.15)
-    result[mask] = (100 + (temp_array[mask] - 223.15) * 2.8).astype(np.uint8)
-    mask = valid_mask & (temp_array <= 223.15)
-    result[mask] = ((temp_array[mask] - 203.15) * 5).astype(np.uint8)
-
-    return result
+    return _piecewise_scale(temp_array, _WVNRL_B_TABLE)
 
 
 def wvnrl_scale(temp_array: np.ndarray) -> np.ndarray:
@@ -264,10 +369,30 @@ def wvnrl_scale(temp_array: np.ndarray) -> np.ndarray:
     Returns:
         RGB画像データ (numpy.ndarray, shape=(height, width, 3))
     """
-    r = wvnrl_r(temp_array)
-    g = wvnrl_g(temp_array)
-    b = wvnrl_b(temp_array)
+    return _piecewise_rgb(temp_array, _WVNRL_TABLE)
 
-    rgb = np.stack([r, g, b], axis=-1)
 
-    return rgb
+def scale_by_lut(scale_func, temp_lut: np.ndarray, data: np.ndarray) -> np.ndarray:
+    """
+    カウント値ごとの輝度温度テーブルにカラースケールを適用し、画像全体に展開
+
+    輝度温度はカウント値 (UInt16) のみで決まるため、カラースケールは
+    65536要素のテーブルに対して1回だけ計算し、画像全体はカウント値による
+    パレット参照のみで変換する（温度は量子化しないため結果は同一）
+
+    Args:
+        scale_func: カラースケール関数 (bd_scale, color2_scale, wvnrl_scale)
+        temp_lut: カウント値から輝度温度へのテーブル (shape=(65536,))
+        data: 元のデータ配列 (UInt16)
+
+    Returns:
+        RGB画像データ (numpy.ndarray, shape=(height, width, 3))
+    """
+    palette = scale_func(temp_lut)
+
+    # グレースケール（3チャンネルをブロードキャストしたビュー）は1チャンネルのみ参照する
+    if palette.strides[-1] == 0:
+        gray = palette[:, 0][data]
+        return np.broadcast_to(gray[..., None], gray.shape + (3,))
+
+    return palette[data]
@@ -66,7 +66,11 @@ def goes_read(filepath: str, debug: bool = False) -> GOESData:
 
         # 放射輝度データを読み込む
         rad_var = nc.variables['Rad']
-        rad_data = rad_var[:].data  # numpy配列として取得
+        # マスク配列の生成と自動スケーリングを無効にして、生のカウント値を
+        # numpy配列として直接取得（校正はgoes_calibrationで行う）
+        rad_var.set_auto_mask(False)
+        rad_var.set_auto_scale(False)
+        rad_data = rad_var[:]
 
         # スケールファクターとオフセット
         scale_factor = float(rad_var.scale_factor)
@@ -125,7 +129,7 @@ def goes_read(filepath: str, debug: bool = False) -> GOESData:
             planck_fk2=planck_fk2,
             planck_bc1=planck_bc1,
             planck_bc2=planck_bc2,
-            data=rad_data.flatten()  # 1次元配列に変換
+            data=rad_data  # (y, x) の2次元配列
         )
 
     finally:
@@ -4,9 +4,10 @@ Himawari Standard Data (HSD) ファイル読み込みモジュール
 import struct
 import os
 import bz2
+import shutil
 import numpy as np
 from dataclasses import dataclass
-from typing import Optional
+from typing import BinaryIO, Optional, Tuple, Union
 
 
 @dataclass
@@ -26,7 +27,7 @@ class HSData:
     c: float = 0.0
     H: float = 0.0
     k: float = 0.0
-    data: Optional[np.ndarray] = None
+    data: Optional[np.ndarray] = None  # 画像データ (height, width) のUInt16配列
     temp: Optional[np.ndarray] = None
 
 
@@ -53,135 +54,78 @@ def decompress_bz2(filepath: str) -> str:
     print(f"bz2ファイルを解凍中: {filepath}")
     with bz2.open(filepath, 'rb') as f_in:
         with open(dat_filepath, 'wb') as f_out:
-            f_out.write(f_in.read())
+            # 1MiBずつストリーム解凍（解凍後のデータ全体をメモリに載せない）
+            shutil.copyfileobj(f_in, f_out, length=1 << 20)
 
     print(f"解凍完了: {dat_filepath}")
     return dat_filepath
 
 
-def hsd_read(filepath: str, delete_dat: bool = False, debug: bool = False) -> HSData:
+# 固定長ヘッダー部（先頭からlen8まで）のレイアウト
+# 各フィールドはファイル先頭からのバイトオフセットで指定する
+# 校正パラメータ c0, c1, c2, c, H, k はバンド7以上の場合のみ有効
+_HEADER_DTYPE = np.dtype({
+    'names': ['satellite_name', 'width', 'height', 'band', 'wavelength', 'bit_num',
+              'slope', 'intc', 'c0', 'c1', 'c2', 'c', 'H', 'k', 'len8'],
+    'formats': ['S16', '<u2', '<u2', '<u2', '<f8', '<u2',
+                '<f8', '<f8', '<f8', '<f8', '<f8', '<f8', '<f8', '<f8', '<u2'],
+    'offsets': [6, 287, 289, 601, 603, 611,
+                617, 625, 633, 641, 649, 681, 689, 697, 1052],
+    'itemsize': 1054,
+})
+
+
+def _read_header(fp: BinaryIO, debug: bool = False) -> Tuple[HSData, int]:
     """
-    HSDファイルを読み込む
+    HSDファイルのヘッダーを読み込む
+
+    シークを使わずに読み進めるため、bz2ストリームからも直接読み込める。
+    呼び出し後、fpは画像データの先頭を指す
 
     Args:
-        filepath: HSDファイルのパス (.DAT または .DAT.bz2)
-        delete_dat: 処理後にDATファイルを削除するか
+        fp: ファイル先頭を指すバイナリストリーム
         debug: デバッグ出力を表示するか
 
     Returns:
-        HSData構造体
+        (画像データ未設定のHSData構造体, 画像データの開始オフセット) のタプル
     """
     if debug:
-        print("debughsdRead1")
-
-    # bz2の場合は解凍
-    dat_filepath = decompress_bz2(filepath)
+        print("debughsdRead3")
+
+    # 固定長ヘッダー部を一括で読み込み、構造化dtypeで解析
+    hdr = np.frombuffer(fp.read(_HEADER_DTYPE.itemsize), dtype=_HEADER_DTYPE, count=1)[0]
+    satellite_name = bytes(hdr['satellite_name']).decode('ascii', errors='ignore').strip('\x00')
+    width = int(hdr['width'])
+    height = int(hdr['height'])
+    band = int(hdr['band'])
+    wavelength = float(hdr['wavelength'])
+    bit_num = int(hdr['bit_num'])
+    slope = float(hdr['slope'])
+    intc = float(hdr['intc'])
+    len8 = int(hdr['len8'])
 
     if debug:
-        print(f"DATファイル: {dat_filepath}")
-        print("debughsdRead2")
+        print(f"debughsdRead6\nwidth: {width}\nheight: {height}")
+        print(f"wavelength: {wavelength}")
+        print(f"bits: {bit_num}")
 
-    # バイナリファイルを開く
-    with open(dat_filepath, 'rb') as fp:
-        if debug:
-            print("debughsdRead3")
-
-        # ヘッダー部分の読み込み
-        fp.seek(6)  # 最初の6バイトをスキップ
-
-        # 衛星名 (16 bytes)
-        satellite_name = fp.read(16).decode('ascii', errors='ignore').strip('\x00')
-
-        fp.seek(260, 1)  # 相対位置で260バイトスキップ
+    # 校正パラメータはバンド7以上の場合のみ有効
+    if band > 6:
+        c0, c1, c2, c, H, k = (float(hdr[name]) for name in ('c0', 'c1', 'c2', 'c', 'H', 'k'))
+    else:
+        c0 = c1 = c2 = c = H = k = 0.0
 
-        if debug:
-            print("debughsdRead4")
-
-        # 1バイト読み込み（使用しない）
-        fp.read(1)
+    # len8, len9, len10（可変長部分）
+    fp.read(len8 - 2)
 
-        fp.seek(4, 1)  # 4バイトスキップ
+    len9 = struct.unpack('<H', fp.read(2))[0]
+    fp.read(len9 - 2)
 
-        if debug:
-            print("debughsdRead5")
+    len10 = struct.unpack('<I', fp.read(4))[0]
+    fp.read(len10 + 254)
 
-        # 幅と高さ (UInt16, little endian)
-        width = struct.unpack('<H', fp.read(2))[0]
-        height = struct.unpack('<H', fp.read(2))[0]
-
-        if debug:
-            print(f"debughsdRead6\nwidth: {width}\nheight: {height}")
+    data_offset = _HEADER_DTYPE.itemsize + len8 + len9 + 2 + len10 + 254
 
-        # 41バイトスキップ
-        fp.seek(41, 1)
-
-        # 269バイトスキップ
-        fp.seek(269, 1)
-
-        # バンド番号 (UInt16)
-        band = struct.unpack('<H', fp.read(2))[0]
-
-        # 波長 (double, 8 bytes)
-        wavelength = struct.unpack('<d', fp.read(8))[0]
-
-        if debug:
-            print(f"wavelength: {wavelength}")
-
-        # ビット数 (UInt16)
-        bit_num = struct.unpack('<H', fp.read(2))[0]
-
-        if debug:
-            print(f"bits: {bit_num}")
-
-        # 4バイトスキップ
-        fp.seek(4, 1)
-
-        # Slope と intc (double)
-        slope = struct.unpack('<d', fp.read(8))[0]
-        intc = struct.unpack('<d', fp.read(8))[0]
-
-        # バンド7以上の場合、校正パラメータを読み込む
-        if band > 6:
-            c0 = struct.unpack('<d', fp.read(8))[0]
-            c1 = struct.unpack('<d', fp.read(8))[0]
-            c2 = struct.unpack('<d', fp.read(8))[0]
-            fp.seek(24, 1)  # 24バイトスキップ
-            c = struct.unpack('<d', fp.read(8))[0]
-            H = struct.unpack('<d', fp.read(8))[0]
-            k = struct.unpack('<d', fp.read(8))[0]
-            fp.seek(40, 1)  # 40バイトスキップ
-        else:
-            c0 = c1 = c2 = c = H = k = 0.0
-            fp.seek(112, 1)  # 112バイトスキップ
-
-        # さらにスキップ
-        fp.seek(1 + 47 + 258 + 1, 1)
-
-        # len8, len9, len10
-        len8 = struct.unpack('<H', fp.read(2))[0]
-        fp.seek(len8 - 2, 1)
-
-        len9 = struct.unpack('<H', fp.read(2))[0]
-        fp.seek(len9 - 2, 1)
-
-        len10 = struct.unpack('<I', fp.read(4))[0]
-        fp.seek(len10, 1)
-
-        fp.seek(254, 1)
-
-        # 画像データを読み込む (UInt16配列)
-        n = width * height
-        if debug:
-            print(f"データサイズ: {n}")
-
-        # バイナリデータを読み込んでnumpy配列に変換
-        data_bytes = fp.read(n * 2)
-        data = np.frombuffer(data_bytes, dtype=np.uint16, count=n)
-
-        if debug:
-            print(f"data[0]: {data[0]}")
-
-    # HSData構造体を作成
     hs_data = HSData(
         satellite_name=satellite_name,
         width=width,
@@ -196,16 +140,86 @@ def hsd_read(filepath: str, delete_dat: bool = False, debug: bool = False) -> HS
         c2=c2,
         c=c,
         H=H,
-        k=k,
-        data=data
+        k=k
     )
 
-    # DATファイルを削除する場合
-    if delete_dat and dat_filepath != filepath:
-        try:
-            os.remove(dat_filepath)
-            print(f"DATファイルを削除しました: {dat_filepath}")
-        except Exception as e:
-            print(f"DATファイルの削除に失敗: {e}")
+    return hs_data, data_offset
+
+
+def _read_stream(fp: BinaryIO, debug: bool = False) -> HSData:
+    """
+    バイナリストリームからHSDデータを読み込む
+
+    Args:
+        fp: ファイル先頭を指すバイナリストリーム
+        debug: デバッグ出力を表示するか
+
+    Returns:
+        HSData構造体
+    """
+    hs_data, _ = _read_header(fp, debug)
+
+    n = hs_data.width * hs_data.height
+    if debug:
+        print(f"データサイズ: {n}")
+
+    hs_data.data = np.frombuffer(fp.read(n * 2), dtype='<u2', count=n).reshape(hs_data.height, hs_data.width)
+
+    if debug:
+        print(f"data[0]: {hs_data.data.flat[0]}")
+
+    return hs_data
+
+
+def hsd_read(filepath: Union[str, BinaryIO], delete_dat: bool = False, debug: bool = False) -> HSData:
+    """
+    HSDファイルを読み込む
+
+    .DATファイルの画像データは np.memmap で参照するため、実際に使用される
+    部分のみがOSによって遅延読み込みされる。
+    delete_dat=True で .bz2 を指定した場合はDATファイルを作成せず、
+    bz2ストリームから直接メモリに読み込む
+
+    Args:
+        filepath: HSDファイルのパス (.DAT または .DAT.bz2)、またはバイナリストリーム
+        delete_dat: DATファイルを残さないか（.bz2の場合のみ有効）
+        debug: デバッグ出力を表示するか
+
+    Returns:
+        HSData構造体
+    """
+    if debug:
+        print("debughsdRead1")
+
+    # ストリームまたはDATを残さないbz2は、ストリームから直接読み込む
+    if not isinstance(filepath, str):
+        return _read_stream(filepath, debug)
+
+    if delete_dat and filepath.endswith('.bz2'):
+        if debug:
+            print(f"bz2ストリームから直接読み込みます: {filepath}")
+        with bz2.open(filepath, 'rb') as fp:
+            return _read_stream(fp, debug)
+
+    # bz2の場合は解凍
+    dat_filepath = decompress_bz2(filepath)
+
+    if debug:
+        print(f"DATファイル: {dat_filepath}")
+        print("debughsdRead2")
+
+    with open(dat_filepath, 'rb') as fp:
+        hs_data, data_offset = _read_header(fp, debug)
+
+    # 画像データ (UInt16配列) をメモリマップで参照（コピーなし）
+    n = hs_data.width * hs_data.height
+    if debug:
+        print(f"データサイズ: {n}")
+
+    hs_data.data = np.memmap(dat_filepath, dtype='<u2', mode='r', offset=data_offset,
+                             shape=(hs_data.height, hs_data.width))
+
+    if debug:
+        print(f"data[0]: {hs_data.data.flat[0]}")
 
     return hs_data
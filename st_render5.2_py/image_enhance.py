@@ -4,8 +4,10 @@ ImageMagickの補正処理をPythonで実装
 GPU対応（CuPy）による高速化をサポート
 """
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from PIL import Image, ImageEnhance
+from PIL import Image, ImageEnhance, ImageStat
 
 # 環境変数の読み込み
 try:
@@ -20,11 +22,21 @@ try:
 except ImportError:
     HAS_CV2 = False
 
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 # 環境変数 USE_GPU でGPU使用を制御
 USE_GPU_ENV = os.getenv('USE_GPU', 'true').lower() in ('true', '1', 'yes')
 
+# 環境変数 GPU_MEMORY_FRACTION でGPUメモリプールの上限（搭載メモリに対する割合）を指定
+GPU_MEMORY_FRACTION = float(os.getenv('GPU_MEMORY_FRACTION', '0.8'))
+
 try:
     import cupy as cp
+    import cupyx
     HAS_CUPY = True
     if USE_GPU_ENV:
         print("CuPy検出: GPU高速化が有効です")
@@ -38,6 +50,187 @@ except ImportError:
     else:
         print("環境変数 USE_GPU=false: CPU処理で実行します")
 
+# CPU版の分割処理: 1タイルの作業量（float32換算）がL2キャッシュに収まる大きさにする
+TILE_BYTES = 1 << 20
+ENHANCE_WORKERS = os.cpu_count() or 1
+
+# GPU版の分割処理: 出力を計算・転送する1タイルの行数
+GPU_TILE_ROWS = 512
+
+# CPU版の中間結果用の作業配列（補正処理用ワーカースレッドごとに用途別に保持して使い回す）
+_SCRATCH = threading.local()
+
+
+def _get_scratch(name: str, shape: tuple) -> np.ndarray:
+    """
+    中間結果用のuint8作業配列を取得
+
+    大きな配列を毎回確保するとmmapとページフォルトのコストがかかるため、
+    補正処理用ワーカースレッドでは確保済みの配列を再利用する（行数が足りない場合のみ確保し直す）。
+    呼び出し元のスレッドでは画像全体の配列を保持し続けないよう、毎回確保する。
+
+    Args:
+        name: 用途名
+        shape: 必要な形状 (H, W, 3)
+
+    Returns:
+        作業配列（先頭H行のビュー）
+    """
+    if not getattr(_SCRATCH, 'is_worker', False):
+        return np.empty(shape, dtype=np.uint8)
+
+    buf = getattr(_SCRATCH, name, None)
+    if buf is None or buf.shape[1:] != tuple(shape[1:]) or buf.shape[0] < shape[0]:
+        buf = np.empty(shape, dtype=np.uint8)
+        setattr(_SCRATCH, name, buf)
+    return buf[:shape[0]]
+
+
+def _init_enhance_worker() -> None:
+    """補正処理用ワーカースレッドの初期化（作業配列の再利用を有効にする）"""
+    _SCRATCH.is_worker = True
+
+
+# CPU版のタイル処理用ワーカースレッド（作業配列を画像をまたいで再利用するため、プロセス内で共有する）
+_ENHANCE_EXECUTOR = ThreadPoolExecutor(max_workers=ENHANCE_WORKERS, initializer=_init_enhance_worker)
+
+# GPU版: レベル補正・彩度・色相・コントラストを1画素ずつまとめて計算するカーネル
+# （各段の結果は従来の処理と同じく0-255の整数に丸める）
+_ENHANCE_PREAMBLE = r'''
+__device__ float level_q(float v, float bp, float wb, float inv_g) {
+    v = fminf(fmaxf((v / 255.0f - bp) / wb, 0.0f), 1.0f);
+    return floorf(fminf(powf(v, inv_g) * 255.0f, 255.0f));
+}
+
+__device__ float saturate_q(float v, float gray, float sat) {
+    return floorf(fminf(fmaxf(gray + sat * (v - gray), 0.0f), 255.0f));
+}
+
+__device__ float hsv_channel(float n, float h, float v, float c) {
+    float k = fmodf(n + h / 60.0f, 6.0f);
+    return v - c * fmaxf(0.0f, fminf(fminf(k, 4.0f - k), 1.0f));
+}
+
+__device__ void rotate_hue(float& r, float& g, float& b, float hue_shift) {
+    float mx = fmaxf(r, fmaxf(g, b));
+    float c = mx - fminf(r, fminf(g, b));
+    if (c > 0.0f) {
+        float h;
+        if (mx == r) {
+            h = (g - b) / c;
+        } else if (mx == g) {
+            h = (b - r) / c + 2.0f;
+        } else {
+            h = (r - g) / c + 4.0f;
+        }
+        h = fmodf(h * 60.0f + hue_shift, 360.0f);
+        if (h < 0.0f) {
+            h += 360.0f;
+        }
+        r = rintf(hsv_channel(5.0f, h, mx, c));
+        g = rintf(hsv_channel(3.0f, h, mx, c));
+        b = rintf(hsv_channel(1.0f, h, mx, c));
+    }
+}
+
+__device__ void level_modulate(float& r, float& g, float& b, float bp, float wb,
+                               float inv_g, float sat, float hue_shift) {
+    // レベル補正（ガンマ補正）
+    r = level_q(r, bp, wb, inv_g);
+    g = level_q(g, bp, wb, inv_g);
+    b = level_q(b, bp, wb, inv_g);
+
+    // 彩度: 輝度との線形補間
+    if (sat != 1.0f) {
+        float gray = 0.299f * r + 0.587f * g + 0.114f * b;
+        r = saturate_q(r, gray, sat);
+        g = saturate_q(g, gray, sat);
+        b = saturate_q(b, gray, sat);
+    }
+
+    // 色相: HSVの色相（度）を回転してRGBに戻す
+    if (hue_shift != 0.0f) {
+        rotate_hue(r, g, b, hue_shift);
+    }
+}
+
+__device__ double modulated_sum(float r, float g, float b, float bp, float wb,
+                                float inv_g, float sat, float hue_shift) {
+    level_modulate(r, g, b, bp, wb, inv_g, sat, hue_shift);
+    return (double)r + (double)g + (double)b;
+}
+
+__device__ unsigned char contrast_q(float v, float mean, float factor) {
+    return (unsigned char)fminf(fmaxf(mean + factor * (v - mean), 0.0f), 255.0f);
+}
+'''
+
+if HAS_CUPY:
+    # GPUメモリプール: 一時配列の確保・解放のたびにcudaMalloc/cudaFreeを呼ばず、確保済みの領域を再利用する
+    _GPU_MEMORY_POOL = cp.cuda.MemoryPool()
+    cp.cuda.set_allocator(_GPU_MEMORY_POOL.malloc)
+    _GPU_MEMORY_POOL.set_limit(fraction=GPU_MEMORY_FRACTION)
+
+    # 演算用と転送用のストリーム（デフォルトストリームによる暗黙の同期を避ける）
+    _COMPUTE_STREAM = cp.cuda.Stream(non_blocking=True)
+    _COPY_STREAM = cp.cuda.Stream(non_blocking=True)
+
+    # ステージングバッファからの転送完了を示すイベント（次の画像の書き込み前に待つ）
+    _STAGING_FREE = None
+
+    # 転送完了を待たずに返した結果ごとの待ち合わせ情報
+    # {id(結果配列): (転送完了イベント, 結果配列, 転送中に保持するGPU配列)}
+    # GPU配列は転送完了まで保持し、処理中にプールへ戻して再利用されないようにする
+    _PENDING_DOWNLOADS = {}
+    _PENDING_LOCK = threading.Lock()
+
+    # 輝度（グレースケール）の重み（ITU-R BT.601）
+    _LUMA_WEIGHTS_GPU = cp.asarray([0.299, 0.587, 0.114], dtype=cp.float32)
+
+    _ENHANCE_PARAMS = 'float32 bp, float32 wb, float32 inv_g, float32 sat, float32 hue_shift'
+
+    # コントラスト強調の基準となる、色調補正後の画素値の合計（中間画像は作らない）
+    _MODULATED_SUM_KERNEL = cp.ReductionKernel(
+        'uint8 x_r, uint8 x_g, uint8 x_b, ' + _ENHANCE_PARAMS,
+        'float64 total',
+        'modulated_sum(x_r, x_g, x_b, bp, wb, inv_g, sat, hue_shift)',
+        'a + b',
+        'total = a',
+        '0',
+        'modulated_sum',
+        preamble=_ENHANCE_PREAMBLE
+    )
+
+    # レベル補正 → 彩度 → 色相 → コントラスト強調を1回のカーネル起動で計算
+    _ENHANCE_KERNEL = cp.ElementwiseKernel(
+        'uint8 x_r, uint8 x_g, uint8 x_b, ' + _ENHANCE_PARAMS + ', float32 mean, float32 factor',
+        'uint8 y_r, uint8 y_g, uint8 y_b',
+        '''
+        float r = x_r, g = x_g, b = x_b;
+        level_modulate(r, g, b, bp, wb, inv_g, sat, hue_shift);
+        y_r = contrast_q(r, mean, factor);
+        y_g = contrast_q(g, mean, factor);
+        y_b = contrast_q(b, mean, factor);
+        ''',
+        'imagemagick_enhance',
+        preamble=_ENHANCE_PREAMBLE
+    )
+
+    # 色相の回転のみ（apply_modulateのGPU版で使用）
+    _HUE_ROTATE_KERNEL = cp.ElementwiseKernel(
+        'uint8 x_r, uint8 x_g, uint8 x_b, float32 hue_shift',
+        'uint8 y_r, uint8 y_g, uint8 y_b',
+        '''
+        float r = x_r, g = x_g, b = x_b;
+        rotate_hue(r, g, b, hue_shift);
+        y_r = r;
+        y_g = g;
+        y_b = b;
+        ''',
+        'hue_rotate',
+        preamble=_ENHANCE_PREAMBLE
+    )
+
 
 def apply_level(img_array: np.ndarray, black_point: float = 0.0, white_point: float = 100.0, gamma: float = 1.0) -> np.ndarray:
     """
@@ -52,45 +245,56 @@ def apply_level(img_array: np.ndarray, black_point: float = 0.0, white_point: fl
     Returns:
         補正後の画像配列
     """
+    # 補正なしの設定では入力をそのまま返す（変換・転送を行わない）
+    if black_point == 0.0 and white_point == 100.0 and gamma == 1.0:
+        return img_array
+
     # パーセンテージを0-1の範囲に変換
     black_point = black_point / 100.0
     white_point = white_point / 100.0
 
     # GPU高速化版（CuPy利用可能な場合）
     if HAS_CUPY and gamma != 1.0:
-        # GPU上で処理
-        result_gpu = cp.asarray(img_array, dtype=cp.float32) / 255.0
+        with _COMPUTE_STREAM:
+            return _to_cpu(_apply_level_gpu(_to_gpu(img_array), black_point, white_point, gamma))
 
-        # レベル補正
-        result_gpu = (result_gpu - black_point) / (white_point - black_point)
-        result_gpu = cp.clip(result_gpu, 0.0, 1.0)
+    # CPU版（256要素の変換テーブルを作成して1回の参照で変換）
+    lut = level_lut(black_point, white_point, gamma)
 
-        # ガンマ補正（GPU上でべき乗計算）
-        result_gpu = cp.power(result_gpu, 1.0 / gamma)
+    if HAS_CV2:
+        return cv2.LUT(img_array, lut)
+    return lut[img_array]
 
-        # 0-255に戻してCPUに転送
-        result = (result_gpu * 255).clip(0, 255).astype(cp.uint8)
-        result = cp.asnumpy(result)
 
-        return result
+def level_lut(black_point: float = 0.0, white_point: float = 1.0, gamma: float = 1.0) -> np.ndarray:
+    """
+    レベル補正の変換テーブルを作成
+
+    Args:
+        black_point: 黒点 (0-1)
+        white_point: 白点 (0-1)
+        gamma: ガンマ値
 
-    # CPU版（従来の処理）
-    # 浮動小数点数に変換
-    result = img_array.astype(np.float32) / 255.0
+    Returns:
+        uint8の変換テーブル (256,)
+    """
+    # 浮動小数点数に変換（以降は同じバッファ上でin-placeに計算）
+    result = np.arange(256, dtype=np.float32)
+    np.divide(result, 255.0, out=result)
 
     # レベル補正の適用
     # (value - black_point) / (white_point - black_point)
-    result = (result - black_point) / (white_point - black_point)
-    result = np.clip(result, 0.0, 1.0)
+    np.subtract(result, black_point, out=result)
+    np.divide(result, white_point - black_point, out=result)
+    np.clip(result, 0.0, 1.0, out=result)
 
     # ガンマ補正（ImageMagick -level 0%,100%,1.5）
     if gamma != 1.0:
-        result = np.power(result, 1.0 / gamma)
-
-    # 0-255に戻す
-    result = (result * 255).clip(0, 255).astype(np.uint8)
+        np.power(result, 1.0 / gamma, out=result)
 
-    return result
+    # 0-255に戻す（0-1にクリップ済みでガンマ補正後も0-1のため、再度のクリップは不要）
+    np.multiply(result, 255, out=result)
+    return result.astype(np.uint8)
 
 
 def apply_modulate(img_array: np.ndarray, brightness: float = 100.0, saturation: float = 100.0, hue: float = 100.0) -> np.ndarray:
@@ -106,10 +310,17 @@ def apply_modulate(img_array: np.ndarray, brightness: float = 100.0, saturation:
     Returns:
         補正後の画像配列
     """
-    # PIL Imageを使用して高速化
-    from PIL import Image, ImageEnhance
+    # 補正なしの設定では入力をそのまま返す（明度は未対応のため判定に含めない）
+    if saturation == 100.0 and hue == 100.0:
+        return img_array
+
+    # GPU高速化版（CuPy利用可能な場合）: 彩度・色相ともにGPU上で処理し、転送は往復1回
+    if HAS_CUPY:
+        with _COMPUTE_STREAM:
+            return _to_cpu(_apply_modulate_gpu(_to_gpu(img_array), saturation, hue))
 
-    img = Image.fromarray(img_array)
+    # CPU版: numpy配列のまま処理し、PILへの変換は彩度調整（ImageEnhance）の前後のみ行う
+    result = img_array
 
     # 20251128_色調補正: 1. 明度（Brightness）の調整
     # 20251128_色調補正: if brightness != 100.0:
@@ -127,24 +338,9 @@ def apply_modulate(img_array: np.ndarray, brightness: float = 100.0, saturation:
     if saturation != 100.0:
         saturation_factor = saturation / 100.0
 
-        # GPU高速化版（CuPy利用可能な場合）
-        if HAS_CUPY:
-            img_array_temp = np.array(img, dtype=np.float32) / 255.0
-            img_gpu = cp.asarray(img_array_temp)
-
-            # RGB to grayscale (luminance)
-            gray = 0.299 * img_gpu[:, :, 0] + 0.587 * img_gpu[:, :, 1] + 0.114 * img_gpu[:, :, 2]
-            gray_3ch = cp.stack([gray, gray, gray], axis=2)
-
-            # Blend original with grayscale
-            result_gpu = gray_3ch + saturation_factor * (img_gpu - gray_3ch)
-            result_gpu = cp.clip(result_gpu * 255, 0, 255).astype(cp.uint8)
-
-            img = Image.fromarray(cp.asnumpy(result_gpu))
-        else:
-            # CPU版（PIL ImageEnhance使用）
-            enhancer = ImageEnhance.Color(img)
-            img = enhancer.enhance(saturation_factor)
+        # CPU版（PIL ImageEnhance使用）
+        enhancer = ImageEnhance.Color(Image.fromarray(result))
+        result = np.asarray(enhancer.enhance(saturation_factor))
 
     # 20251128_色調補正: 3. 色相（Hue）の調整
     # 20251128_色調補正: # PILには直接的な色相調整がないため、HSVで処理
@@ -163,36 +359,23 @@ def apply_modulate(img_array: np.ndarray, brightness: float = 100.0, saturation:
 
     # 色相（Hue）の調整（ImageMagick -modulate 100,250,102）
     if hue != 100.0 and HAS_CV2:
-        img_array_temp = np.array(img)
-
-        # GPU高速化版（CuPy利用可能な場合）
-        if HAS_CUPY:
-            # RGBからHSVに変換（OpenCV CPU版）
-            hsv = cv2.cvtColor(img_array_temp, cv2.COLOR_RGB2HSV)
-
-            # GPU上で色相シフト処理
-            hsv_gpu = cp.asarray(hsv, dtype=cp.float32)
-            hue_shift = ((hue - 100.0) / 100.0) * 180.0  # OpenCVのHueは0-180
-            hsv_gpu[:, :, 0] = (hsv_gpu[:, :, 0] + hue_shift) % 180
-            hsv = cp.asnumpy(hsv_gpu).astype(np.uint8)
-
-            # HSVからRGBに戻す（OpenCV CPU版）
-            img_array_temp = cv2.cvtColor(hsv, cv2.COLOR_HSV2RGB)
-            img = Image.fromarray(img_array_temp)
-        else:
-            # CPU版（従来の処理）
-            # RGBからHSVに変換
-            hsv = cv2.cvtColor(img_array_temp, cv2.COLOR_RGB2HSV).astype(np.float32)
-            # 色相をシフト（ImageMagickの-modulateの色相は0-200の範囲）
-            hue_shift = ((hue - 100.0) / 100.0) * 180.0  # OpenCVのHueは0-180
-            hsv[:, :, 0] = (hsv[:, :, 0] + hue_shift) % 180
-            # HSVからRGBに戻す
-            img_array_temp = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2RGB)
-            img = Image.fromarray(img_array_temp)
+        # CPU版（OpenCV使用）
+        # RGBからHSVに変換（uint8のまま扱う）
+        # HSV配列は関数内でのみ使うため作業配列に書き込む
+        hsv = cv2.cvtColor(result, cv2.COLOR_RGB2HSV, dst=_get_scratch('hsv', result.shape))
+        # 色相をシフト（ImageMagickの-modulateの色相は0-200の範囲）
+        hue_shift = ((hue - 100.0) / 100.0) * 180.0  # OpenCVのHueは0-180
+        # 色相チャンネルのみ256要素のテーブルで変換（float32のHSV配列を作らない）
+        hue_lut = ((np.arange(256, dtype=np.float32) + np.float32(hue_shift)) % 180).astype(np.uint8)
+        # 彩度・明度は恒等変換の3チャンネルテーブルにして、cv2.LUTで分岐なしにin-placeで参照
+        identity = np.arange(256, dtype=np.uint8)
+        hsv_lut = np.stack([hue_lut, identity, identity], axis=-1).reshape(1, 256, 3)
+        hsv = cv2.LUT(hsv, hsv_lut, dst=hsv)
+        # HSVからRGBに戻す
+        result = cv2.cvtColor(hsv, cv2.COLOR_HSV2RGB)
     elif hue != 100.0 and not HAS_CV2:
         print("警告: opencv-pythonがインストールされていないため、色相調整をスキップします")
 
-    result = np.array(img)
     return result
 
 
@@ -207,28 +390,68 @@ def apply_contrast(img_array: np.ndarray, enhance_factor: float = 1.5) -> np.nda
     Returns:
         補正後の画像配列
     """
+    # 係数1では平均値との差が変わらないため、入力をそのまま返す
+    if enhance_factor == 1.0:
+        return img_array
+
     # GPU高速化版（CuPy利用可能な場合）
     if HAS_CUPY:
-        img_gpu = cp.asarray(img_array, dtype=cp.float32) / 255.0
+        with _COMPUTE_STREAM:
+            return _to_cpu(_apply_contrast_gpu(_to_gpu(img_array), enhance_factor))
+
+    # CPU版（PIL ImageEnhance.Contrastと同じ結果を256要素のテーブルで計算）
+    # 平均輝度はPILと同じくグレースケール変換した値から求める
+    if HAS_NUMBA:
+        # PIL画像・グレースケール画像を作らず、Numbaの並列ループ1回で合計する
+        height, width = img_array.shape[:2]
+        mean = int(_luminance_sum(img_array) / (height * width) + 0.5)
+    else:
+        mean = int(ImageStat.Stat(Image.fromarray(img_array).convert('L')).mean[0] + 0.5)
+    lut = contrast_lut(mean, enhance_factor)
 
-        # Mean value
-        mean = cp.mean(img_gpu)
+    if HAS_CV2:
+        return cv2.LUT(img_array, lut)
+    return lut[img_array]
 
-        # Enhance contrast
-        result_gpu = mean + enhance_factor * (img_gpu - mean)
-        result_gpu = cp.clip(result_gpu * 255, 0, 255).astype(cp.uint8)
 
-        return cp.asnumpy(result_gpu)
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _luminance_sum(img_array):
+        """
+        PILの"L"変換（ITU-R 601-2）と同じ整数演算で輝度を求め、全画素の合計を返す
 
-    # CPU版（PIL ImageEnhance使用）
-    img = Image.fromarray(img_array)
-    enhancer = ImageEnhance.Contrast(img)
-    img_enhanced = enhancer.enhance(enhance_factor)
+        Args:
+            img_array: 入力画像配列 (H, W, 3)
 
-    # numpyに戻す
-    result = np.array(img_enhanced)
+        Returns:
+            輝度の合計
+        """
+        total = 0
+        for y in prange(img_array.shape[0]):
+            row = 0
+            for x in range(img_array.shape[1]):
+                row += (np.int64(img_array[y, x, 0]) * 19595 + np.int64(img_array[y, x, 1]) * 38470
+                        + np.int64(img_array[y, x, 2]) * 7471 + 0x8000) >> 16
+            total += row
+        return total
 
-    return result
+
+def contrast_lut(mean: int, enhance_factor: float) -> np.ndarray:
+    """
+    コントラスト強調の変換テーブルを作成（PILのImage.blendと同じfloat32計算・切り捨て）
+
+    Args:
+        mean: 平均輝度 (0-255)
+        enhance_factor: コントラスト強調係数
+
+    Returns:
+        uint8の変換テーブル (256,)
+    """
+    values = np.arange(256, dtype=np.float32) - np.float32(mean)
+    values *= np.float32(enhance_factor)
+    values += np.float32(mean)
+    np.clip(values, 0, 255, out=values)
+    return values.astype(np.uint8)
 
 
 def apply_imagemagick_enhance(
@@ -237,7 +460,8 @@ def apply_imagemagick_enhance(
     modulate_brightness: float = 100.0,
     modulate_saturation: float = 250.0,
     modulate_hue: float = 102.0,
-    apply_contrast_enhance: bool = True
+    apply_contrast_enhance: bool = True,
+    blocking: bool = True
 ) -> np.ndarray:
     """
     ImageMagickの補正処理を適用
@@ -246,28 +470,369 @@ def apply_imagemagick_enhance(
     convert input.png -level 0%,100%,1.5 -modulate 100,250,102 -contrast output.png
 
     Args:
-        img_array: 入力画像配列 (H, W, 3)
+        img_array: 入力画像配列 (H, W, 3)。GPU版ではGPU上のCuPy配列も可（転送せずに処理）
         level_gamma: レベル補正のガンマ値（デフォルト: 1.5）
         modulate_brightness: 明度（デフォルト: 100）
         modulate_saturation: 彩度（デフォルト: 250）
         modulate_hue: 色相（デフォルト: 102）
         apply_contrast_enhance: コントラスト強調を適用するか（デフォルト: True）
+        blocking: GPU版でホストへの転送完了を待つか（デフォルト: True）。
+            Falseの場合、結果を読む前に wait_enhance(結果) を呼ぶこと
 
     Returns:
-        補正後の画像配列
+        補正後の画像配列（numpy配列）
     """
-    # 1. レベル補正（ガンマ補正）
-    result = apply_level(img_array, black_point=0.0, white_point=100.0, gamma=level_gamma)
+    # 全段が補正なしの設定では入力をそのまま返す
+    if (level_gamma == 1.0 and modulate_saturation == 100.0 and modulate_hue == 100.0
+            and not apply_contrast_enhance):
+        if HAS_CUPY and isinstance(img_array, cp.ndarray):
+            return cp.asnumpy(img_array)
+        return img_array
+
+    # GPU版: 1回の転送と融合カーネルで全段を処理
+    if HAS_CUPY:
+        result = _enhance_gpu(img_array, level_gamma, modulate_saturation, modulate_hue, apply_contrast_enhance)
+        if blocking:
+            wait_enhance(result)
+        return result
+
+    # CPU版: レベル補正の変換テーブルは全タイルで共有し、結果は出力配列に直接書き込む
+    lut = level_lut(0.0, 1.0, level_gamma)
+    result = np.empty(img_array.shape, dtype=np.uint8)
 
-    # 2. 色調補正（明度・彩度・色相）
-    result = apply_modulate(result, brightness=modulate_brightness, saturation=modulate_saturation, hue=modulate_hue)
+    def _level_modulate(rows: slice) -> None:
+        tile = img_array[rows]
+
+        # 1. レベル補正（ガンマ補正）: 中間結果はスレッドごとの作業配列に書き込む
+        if level_gamma == 1.0:
+            level = tile
+        else:
+            level = _get_scratch('level', tile.shape)
+            if HAS_CV2:
+                level = cv2.LUT(tile, lut, dst=level)
+            else:
+                np.take(lut, tile, out=level)
+
+        # 2. 色調補正（明度・彩度・色相）
+        result[rows] = apply_modulate(level, brightness=modulate_brightness, saturation=modulate_saturation, hue=modulate_hue)
+
+    # 1と2は画素ごとの処理のため、行方向のタイルに分割してスレッド並列で処理
+    # （numpy / OpenCV / PILの内部処理はGILを解放する）
+    height, width = img_array.shape[:2]
+    tile_rows = max(1, TILE_BYTES // (width * 3 * 4))
+    if ENHANCE_WORKERS > 1 and height > tile_rows:
+        tiles = [slice(y, y + tile_rows) for y in range(0, height, tile_rows)]
+        list(_ENHANCE_EXECUTOR.map(_level_modulate, tiles))
+    else:
+        _level_modulate(slice(None))
 
     # 20251128_色調補正: 3. コントラスト強調
     # 20251128_色調補正: if apply_contrast_enhance:
     # 20251128_色調補正:     result = apply_contrast(result, enhance_factor=1.5)
 
     # 20251129_色調補正_v2: 3. コントラスト強調（ImageMagick -contrast）
+    # 画像全体の平均輝度を使うため、タイル分割せずに処理
     if apply_contrast_enhance:
         result = apply_contrast(result, enhance_factor=1.5)
 
     return result
+
+
+def wait_enhance(result: np.ndarray) -> None:
+    """
+    apply_imagemagick_enhance(blocking=False) が返した結果のホストへの転送の完了を待つ
+
+    待つのは指定した結果の転送のみで、その処理が使ったGPU配列だけを解放する
+    （他の画像の処理中に呼んでも影響しない）。CPU版の結果や転送待ちのない配列では何もしない。
+
+    Args:
+        result: apply_imagemagick_enhance の戻り値
+    """
+    if HAS_CUPY:
+        with _PENDING_LOCK:
+            pending = _PENDING_DOWNLOADS.get(id(result))
+            # 同じidの別の配列（解放済みの結果のidを再利用した配列）の登録は取り出さない
+            if pending is not None and pending[1] is result:
+                del _PENDING_DOWNLOADS[id(result)]
+            else:
+                pending = None
+        if pending is not None:
+            pending[0].synchronize()
+
+
+def _register_download(result: np.ndarray, event: 'cp.cuda.Event', gpu_arrays: tuple) -> None:
+    """
+    転送完了を待たずに返す結果を登録（wait_enhance(result) で待つ）
+
+    結果配列自体も保持するため、登録中に同じidの配列が作られることはない。
+    wait_enhance が呼ばれなかった結果を保持し続けないよう、登録のたびに転送が完了した登録を破棄する。
+
+    Args:
+        result: 転送先のホスト配列
+        event: 転送完了を示すイベント
+        gpu_arrays: 転送完了まで解放させないGPU配列
+    """
+    with _PENDING_LOCK:
+        for key in [key for key, pending in _PENDING_DOWNLOADS.items() if pending[0].done]:
+            del _PENDING_DOWNLOADS[key]
+        _PENDING_DOWNLOADS[id(result)] = (event, result, gpu_arrays)
+
+
+# GPU転送用のピン留め（ページロック）ホストメモリ。必要な大きさまで拡張して使い回す
+_PINNED_STAGING = None
+
+# メモリプールに確保済みの最大ブロックサイズ（バイト）
+_GPU_RESERVED_BYTES = 0
+
+
+def _reserve_gpu_memory(nbytes: int) -> None:
+    """
+    GPUメモリプールに指定サイズのブロックを確保しておく（ウォームアップ）
+
+    初回だけ確保してすぐに解放し、以降の一時配列はプール内のブロックから切り出す。
+
+    Args:
+        nbytes: 確保するバイト数
+    """
+    global _GPU_RESERVED_BYTES
+
+    if nbytes > _GPU_RESERVED_BYTES:
+        block = cp.empty((nbytes,), dtype=cp.uint8)
+        del block
+        _GPU_RESERVED_BYTES = nbytes
+
+
+def _to_gpu(img_array: np.ndarray) -> 'cp.ndarray':
+    """
+    ピン留めメモリを経由して画像をGPUに転送
+
+    ページング可能なメモリからの転送ではドライバ内部でのコピーが入るため、
+    ピン留めしたステージングバッファにコピーしてからDMAで転送する。
+
+    Args:
+        img_array: 入力画像配列
+
+    Returns:
+        GPU上の画像配列
+    """
+    global _PINNED_STAGING, _STAGING_FREE
+
+    # 前の画像の転送がステージングバッファを読み終えるまで待つ
+    if _STAGING_FREE is not None:
+        _STAGING_FREE.synchronize()
+
+    nbytes = img_array.size * img_array.itemsize
+    if _PINNED_STAGING is None or _PINNED_STAGING.size < nbytes:
+        _PINNED_STAGING = cupyx.empty_pinned((nbytes,), dtype=np.uint8)
+
+    staging = _PINNED_STAGING[:nbytes].view(img_array.dtype).reshape(img_array.shape)
+    np.copyto(staging, img_array)
+
+    # 画像1枚分のfloat32配列に相当するブロックをプールに用意しておく
+    _reserve_gpu_memory(img_array.size * 4)
+
+    stream = cp.cuda.get_current_stream()
+    img_gpu = cp.empty(img_array.shape, dtype=img_array.dtype)
+    img_gpu.set(staging, stream=stream)
+    _STAGING_FREE = stream.record()
+    return img_gpu
+
+
+def _to_cpu(img_gpu: 'cp.ndarray', blocking: bool = True) -> np.ndarray:
+    """
+    GPU上の画像をピン留めメモリに直接転送
+
+    返す配列はCuPyのピン留めメモリプールから確保し、解放時にプールへ戻る。
+    転送は現在のストリームに発行済みの処理の完了を待ってから転送用ストリームで行う。
+
+    Args:
+        img_gpu: GPU上の画像配列
+        blocking: 転送完了を待つか。Falseの場合は wait_enhance(結果) まで結果を読まないこと
+
+    Returns:
+        画像配列
+    """
+    img_gpu = cp.ascontiguousarray(img_gpu)
+    result = cupyx.empty_pinned(img_gpu.shape, dtype=img_gpu.dtype)
+    _COPY_STREAM.wait_event(cp.cuda.get_current_stream().record())
+    _download_async(img_gpu, result)
+    done = _COPY_STREAM.record()
+    if blocking:
+        done.synchronize()
+    else:
+        _register_download(result, done, (img_gpu,))
+    return result
+
+
+def _download_async(img_gpu: 'cp.ndarray', out: np.ndarray) -> None:
+    """
+    GPU上の配列をピン留めメモリへ転送用ストリームで非同期にコピー
+
+    ndarray.get(blocking=False) はCuPy 13以降にしかないため、CUDAランタイムのmemcpyAsyncを直接使う。
+    転送完了は _COPY_STREAM に記録したイベントで待つこと。
+
+    Args:
+        img_gpu: GPU上の配列（C連続）
+        out: 転送先のピン留めメモリ上の配列（同じ形状・型のC連続）
+    """
+    cp.cuda.runtime.memcpyAsync(out.ctypes.data, img_gpu.data.ptr, img_gpu.nbytes,
+                                cp.cuda.runtime.memcpyDeviceToHost, _COPY_STREAM.ptr)
+
+
+def _apply_level_gpu(img_gpu: 'cp.ndarray', black_point: float, white_point: float, gamma: float) -> 'cp.ndarray':
+    """
+    レベル補正をGPU上の画像に適用（転送なし）
+
+    画素値は256通りしかないため、画像全体をfloat32に変換せず、
+    CPU版と同じ変換テーブルを参照するだけで補正する（uint8のまま読み書き）。
+
+    Args:
+        img_gpu: 入力画像配列 (H, W, 3)、GPU上のuint8
+        black_point: 黒点 (0-1)
+        white_point: 白点 (0-1)
+        gamma: ガンマ値
+
+    Returns:
+        補正後の画像配列（GPU上のuint8）
+    """
+    lut_gpu = cp.asarray(level_lut(black_point, white_point, gamma))
+    return lut_gpu[img_gpu]
+
+
+def _apply_modulate_gpu(img_gpu: 'cp.ndarray', saturation: float, hue: float) -> 'cp.ndarray':
+    """
+    色調補正（彩度・色相）をGPU上の画像に適用（転送なし）
+
+    Args:
+        img_gpu: 入力画像配列 (H, W, 3)、GPU上のuint8
+        saturation: 彩度 (100が基準)
+        hue: 色相 (100が基準)
+
+    Returns:
+        補正後の画像配列（GPU上のuint8）
+    """
+    # 彩度（Saturation）の調整
+    if saturation != 100.0:
+        saturation_factor = saturation / 100.0
+        img_f32 = img_gpu.astype(cp.float32) / 255.0
+
+        # RGB to grayscale (luminance)
+        # 3チャンネルの重み付き和を1回の行列ベクトル積で求め、(H, W, 1)に戻してブロードキャストで計算
+        gray = (img_f32.reshape(-1, 3) @ _LUMA_WEIGHTS_GPU).reshape(img_f32.shape[:2] + (1,))
+
+        # Blend original with grayscale
+        result_gpu = gray + saturation_factor * (img_f32 - gray)
+        img_gpu = cp.clip(result_gpu * 255, 0, 255).astype(cp.uint8)
+
+    # 色相（Hue）の調整
+    # GPU上でRGB→HSV→RGBを1画素ずつ計算するカーネルで色相を回転（CPUでのHSV変換なし）
+    if hue != 100.0:
+        hue_shift = np.float32((hue - 100.0) / 100.0 * 360.0)  # OpenCV版（Hue 0-180）と同じシフト量を度で指定
+        result_gpu = cp.empty_like(img_gpu)
+        _HUE_ROTATE_KERNEL(img_gpu[:, :, 0], img_gpu[:, :, 1], img_gpu[:, :, 2], hue_shift,
+                           result_gpu[:, :, 0], result_gpu[:, :, 1], result_gpu[:, :, 2])
+        img_gpu = result_gpu
+
+    return img_gpu
+
+
+def _apply_contrast_gpu(img_gpu: 'cp.ndarray', enhance_factor: float) -> 'cp.ndarray':
+    """
+    コントラスト強調をGPU上の画像に適用（転送なし）
+
+    平均値だけをGPU上で求め、強調自体は256要素の変換テーブルの参照で行う（uint8のまま読み書き）。
+
+    Args:
+        img_gpu: 入力画像配列 (H, W, 3)、GPU上のuint8
+        enhance_factor: コントラスト強調係数
+
+    Returns:
+        補正後の画像配列（GPU上のuint8）
+    """
+    # Mean value (0-1)
+    mean = np.float32(float(cp.mean(img_gpu)) / 255.0)
+
+    # Enhance contrast
+    values = np.arange(256, dtype=np.float32) / np.float32(255.0)
+    values = mean + np.float32(enhance_factor) * (values - mean)
+    lut = np.clip(values * np.float32(255.0), 0, 255).astype(np.uint8)
+    return cp.asarray(lut)[img_gpu]
+
+
+def _enhance_gpu(
+    img_array: np.ndarray,
+    level_gamma: float,
+    modulate_saturation: float,
+    modulate_hue: float,
+    apply_contrast_enhance: bool
+) -> np.ndarray:
+    """
+    ImageMagickの補正処理をGPUの融合カーネルで適用
+
+    画像の転送は往復1回のみで、中間画像はGPU上にも作らない。
+    コントラスト強調の平均値は、色調補正後の値をリダクションカーネルで再計算して求める。
+    出力は GPU_TILE_ROWS 行ごとに2つのバッファを交互に使って計算し、
+    タイルの計算と前のタイルのホストへの転送を重ねる（出力用のGPUメモリは2タイル分のみ）。
+
+    Args:
+        img_array: 入力画像配列 (H, W, 3)、またはGPU上のCuPy配列
+        level_gamma: レベル補正のガンマ値
+        modulate_saturation: 彩度 (100が基準)
+        modulate_hue: 色相 (100が基準)
+        apply_contrast_enhance: コントラスト強調を適用するか
+
+    Returns:
+        補正後の画像配列
+    """
+    # アップロード・カーネル・ダウンロードを演算用ストリームに順に発行し、
+    # ホストへの転送完了は待たずに返す（呼び出し側が必要になった時点で同期する）
+    if isinstance(img_array, cp.ndarray):
+        # GPU上の配列は、作成したストリームの処理が終わってから使う
+        _COMPUTE_STREAM.wait_event(cp.cuda.get_current_stream().record())
+    with _COMPUTE_STREAM:
+        img_gpu = img_array if isinstance(img_array, cp.ndarray) else _to_gpu(img_array)
+        channels = (img_gpu[:, :, 0], img_gpu[:, :, 1], img_gpu[:, :, 2])
+
+        # 黒点0%・白点100%、色相はOpenCV版と同じシフト量（Hue 0-180）を度（0-360）に換算
+        params = (
+            np.float32(0.0),
+            np.float32(1.0),
+            np.float32(1.0 / level_gamma),
+            np.float32(modulate_saturation / 100.0),
+            np.float32((modulate_hue - 100.0) / 100.0 * 360.0),
+        )
+
+        # コントラスト強調（ImageMagick -contrast）の平均値
+        if apply_contrast_enhance:
+            mean = np.float32(float(_MODULATED_SUM_KERNEL(*channels, *params)) / img_gpu.size)
+            factor = np.float32(1.5)
+        else:
+            mean = np.float32(0.0)
+            factor = np.float32(1.0)
+
+        # 出力は行方向のタイルに分割し、2つのバッファを交互に使って計算・転送する
+        height = img_gpu.shape[0]
+        tile_rows = min(GPU_TILE_ROWS, height)
+        buffers = [cp.empty((tile_rows,) + img_gpu.shape[1:], dtype=cp.uint8) for _ in range(2)]
+        copied = [None, None]
+        result = cupyx.empty_pinned(img_gpu.shape, dtype=np.uint8)
+
+        for i, y in enumerate(range(0, height, tile_rows)):
+            tile_in = img_gpu[y:y + tile_rows]
+            tile_out = buffers[i % 2][:tile_in.shape[0]]
+
+            # 同じバッファを使った2つ前のタイルの転送が終わるまで書き込まない
+            if copied[i % 2] is not None:
+                _COMPUTE_STREAM.wait_event(copied[i % 2])
+
+            _ENHANCE_KERNEL(tile_in[:, :, 0], tile_in[:, :, 1], tile_in[:, :, 2], *params, mean, factor,
+                            tile_out[:, :, 0], tile_out[:, :, 1], tile_out[:, :, 2])
+
+            _COPY_STREAM.wait_event(_COMPUTE_STREAM.record())
+            _download_async(tile_out, result[y:y + tile_rows])
+            copied[i % 2] = _COPY_STREAM.record()
+
+        # 最後のタイルの転送完了を待つイベントを記録し、
+        # 入力画像と出力バッファは wait_enhance(result) まで保持する
+        _register_download(result, _COPY_STREAM.record(), (img_gpu, *buffers))
+        return result
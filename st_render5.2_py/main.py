@@ -9,16 +9,22 @@ import sys
 import os
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image
 
 from hsd_reader import hsd_read
 from goes_reader import goes_read
-from calibration import hsd_calibration, goes_calibration
-from colorscale import bw_scale, bd_scale, color2_scale, wvnrl_scale
+from calibration import hsd_temperature_lut, goes_calibration
+from colorscale import bw_scale, bd_scale, color2_scale, wvnrl_scale, scale_by_lut
 from rgb_composite import create_rgb_composite, create_natural_color_rgb
 from segment_merger import read_hsd_full
-from image_enhance import apply_imagemagick_enhance
+from image_enhance import apply_imagemagick_enhance, wait_enhance
+
+# 画像保存用のワーカースレッド（GPUからの転送・PNG圧縮の間に次の処理を進める）
+# PNG圧縮（libpng/zlib）はGILを解放するため、複数枚を並列に圧縮できる
+_SAVE_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) // 2))
+_SAVE_FUTURES = []
 
 
 def get_output_path(input_filepath: str, output_path: str = None, output_dir: str = None) -> str:
@@ -59,6 +65,44 @@ def get_output_path(input_filepath: str, output_path: str = None, output_dir: st
     return final_path
 
 
+def _save_image(img_array: np.ndarray, output_path: str):
+    """
+    画像を保存（ワーカースレッドで実行）
+
+    Args:
+        img_array: 画像配列 (H, W, 3)
+        output_path: 出力ファイルパス
+    """
+    # GPU版の画像補正は転送完了を待たずに返るため、読む前に同期する
+    wait_enhance(img_array)
+
+    # 白黒・BDスケールはブロードキャストしたビューのため、ここで連続配列にする
+    # PNGはcompress_level=1で保存（デフォルトの6より圧縮率は下がるが数倍速い）
+    img = Image.fromarray(np.ascontiguousarray(img_array))
+    img.save(output_path, quality=99, compress_level=1)
+
+    print(f"画像を保存しました: {output_path}")
+
+
+def save_image_async(img_array: np.ndarray, output_path: str):
+    """
+    画像の保存をワーカースレッドに依頼
+
+    完了は wait_saves() で待つ。
+
+    Args:
+        img_array: 画像配列 (H, W, 3)
+        output_path: 出力ファイルパス
+    """
+    _SAVE_FUTURES.append(_SAVE_EXECUTOR.submit(_save_image, img_array, output_path))
+
+
+def wait_saves():
+    """依頼済みの画像保存がすべて終わるまで待つ（保存時の例外はここで送出される）"""
+    while _SAVE_FUTURES:
+        _SAVE_FUTURES.pop(0).result()
+
+
 def hsd_render(filepath: str, color: int, output_path: str = None, output_dir: str = None,
                delete_dat: bool = False, auto_merge: bool = True, enhance: bool = False):
     """
@@ -88,18 +132,19 @@ def hsd_render(filepath: str, color: int, output_path: str = None, output_dir: s
     # 画像データを生成
     if hs_data.band > 3:
         # 赤外バンドの場合は校正を実行
+        # カウント値ごとの輝度温度テーブルのみ作成し、画像全体の温度配列は作らない
         print("データ校正中...")
-        hsd_calibration(hs_data, debug=True)
+        temp_lut = hsd_temperature_lut(hs_data)
 
         print("hsdRenderdbg1")
 
-        # カラースケール変換
+        # カラースケール変換（テーブルに適用してからカウント値で参照）
         if color == 1:
-            pixels = bd_scale(hs_data.temp)
+            pixels = scale_by_lut(bd_scale, temp_lut, hs_data.data)
         elif color == 2:
-            pixels = color2_scale(hs_data.temp)
+            pixels = scale_by_lut(color2_scale, temp_lut, hs_data.data)
         elif color == 3:
-            pixels = wvnrl_scale(hs_data.temp)
+            pixels = scale_by_lut(wvnrl_scale, temp_lut, hs_data.data)
         else:
             pixels = bw_scale(hs_data.data, hs_data.bit_num)
     else:
@@ -115,13 +160,11 @@ def hsd_render(filepath: str, color: int, output_path: str = None, output_dir: s
     # ImageMagick風の補正を適用（オプション）
     if enhance:
         print("画像補正を適用中...")
-        img_array = apply_imagemagick_enhance(img_array)
+        img_array = apply_imagemagick_enhance(img_array, blocking=False)
 
-    img = Image.fromarray(img_array)
-    img.save(output_path, quality=99)
+    save_image_async(img_array, output_path)
 
     print(f"hsdRenderdbg3")
-    print(f"画像を保存しました: {output_path}")
 
 
 def goes_render(filepath: str, color: int, output_path: str = None, output_dir: str = None, enhance: bool = False):
@@ -151,8 +194,8 @@ def goes_render(filepath: str, color: int, output_path: str = None, output_dir:
     goes_calibration(goes_data, debug=True)
 
     print(f"planck_fk1: {goes_data.planck_fk1}")
-    print(f"data[0]: {goes_data.data[0]}")
-    print(f"temp[0]: {goes_data.temp[0]}")
+    print(f"data[0]: {goes_data.data.flat[0]}")
+    print(f"temp[0]: {goes_data.temp.flat[0]}")
 
     # カラースケール変換
     if color == 1:
@@ -171,12 +214,9 @@ def goes_render(filepath: str, color: int, output_path: str = None, output_dir:
     # ImageMagick風の補正を適用（オプション）
     if enhance:
         print("画像補正を適用中...")
-        img_array = apply_imagemagick_enhance(img_array)
-
-    img = Image.fromarray(img_array)
-    img.save(output_path, quality=99)
+        img_array = apply_imagemagick_enhance(img_array, blocking=False)
 
-    print(f"画像を保存しました: {output_path}")
+    save_image_async(img_array, output_path)
 
 
 def show_help():
@@ -330,8 +370,12 @@ def main():
                 output_path=output_path,
                 gamma=args.get('gamma', 0.5),
                 delete_dat=False,
-                enhance=args.get('enhance', False)
+                enhance=args.get('enhance', False),
+                save_func=save_image_async
             )
+
+        # バックグラウンドの画像保存の完了を待つ
+        wait_saves()
     except Exception as e:
         print(f"エラーが発生しました: {e}")
         import traceback
@@ -3,17 +3,38 @@ RGB合成モジュール
 複数のHSDファイル（バンド1-3）からRGB画像を生成
 """
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Callable, List, Tuple, Optional
 from PIL import Image
 import os
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 from hsd_reader import hsd_read, HSData
-from segment_merger import read_hsd_full
-from image_enhance import apply_imagemagick_enhance
+from segment_merger import read_hsd_full, resolve_hsd_files, list_dir_names
+from image_enhance import apply_imagemagick_enhance, HAS_CUPY
+
+# リサイズするバンドの分割処理: 1ストリップの元データ量（正規化・縮小の間キャッシュに留まる大きさ）
+STRIP_BYTES = 4 << 20
+
+if HAS_CUPY:
+    import cupy as cp
+
+    # normalize_band_dataのGPU版（欠損値は暗いグレー、それ以外は上位8ビット）
+    _NORMALIZE_KERNEL_GPU = cp.ElementwiseKernel(
+        'uint16 x, int32 shift',
+        'uint8 y',
+        'y = (x == 0 || x >= 65534) ? 2 : (unsigned char)(x >> shift)',
+        'normalize_band'
+    )
 
 
-def normalize_band_data(data: np.ndarray, bit_num: int) -> np.ndarray:
+def normalize_band_data(data: np.ndarray, bit_num: int, out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     バンドデータをグレースケール画像に変換（ガイドの手順を再現）
 
@@ -24,26 +45,223 @@ def normalize_band_data(data: np.ndarray, bit_num: int) -> np.ndarray:
     この関数は手順1を実装（ガンマ補正は後で適用）
 
     Args:
-        data: 元のデータ配列 (UInt16)
+        data: 元のデータ配列 (UInt16、形状は問わない。通常は (height, width))
         bit_num: ビット数
+        out: 出力先の配列 (UInt8、dataと同じ形状)。省略時は新しく確保
 
     Returns:
         グレースケール配列 (0-255のUInt8)
     """
-    # 欠損値を検出（16ビット格納で65534, 65535が欠損マーカー）
-    invalid_mask = (data >= 65534) | (data == 0)
-
     # C++版のBW関数を再現: ビットシフトで上位8ビットを取得
     # 例: 11ビットデータ → 3ビット右シフト
+    # シフト結果は直接uint8の配列に書き込む（uint16の中間配列を作らない）
     shift_bits = max(0, bit_num - 8)
-    scaled = (data >> shift_bits).astype(np.uint8)
+    if out is None:
+        out = np.empty(data.shape, dtype=np.uint8)
+
+    # Numba版: シフト・欠損値の判定・uint8への書き込みを1回の並列ループで行う
+    if HAS_NUMBA and data.ndim == 2:
+        _normalize_kernel(data, shift_bits, out)
+        return out
+
+    scaled = np.right_shift(data, shift_bits, out=out, casting='unsafe')
+
+    # 欠損値を検出（0と、16ビット格納で65534, 65535が欠損マーカー）
+    # data - 1 をuint16で計算すると0は65535に回り込むため、1回の比較で3値をまとめて判定できる
+    invalid_mask = np.subtract(data, 1, dtype=np.uint16) >= 65533
 
     # 欠損値を暗いグレー（地球の縁の色に近い値）に設定
-    scaled[invalid_mask] = 2
+    np.copyto(scaled, 2, where=invalid_mask)
 
     return scaled
 
 
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _normalize_value(value, shift):
+        """
+        1画素分の正規化（normalize_band_dataと同じ変換）
+        """
+        # 欠損値（0と、16ビット格納で65534, 65535）は暗いグレー
+        if value == 0 or value >= 65534:
+            return np.uint8(2)
+        return np.uint8((value >> shift) & 0xFF)
+
+    @njit(parallel=True, cache=True)
+    def _normalize_kernel(data, shift, out):
+        """
+        1バンドの正規化を行う並列ループのNumbaカーネル（出力へ直接書き込む）
+
+        Args:
+            data: 元のデータ配列 (height, width)、UInt16
+            shift: 右シフト量
+            out: 出力配列 (height, width)、UInt8（RGB配列のチャンネルのビューも可）
+        """
+        for y in prange(data.shape[0]):
+            for x in range(data.shape[1]):
+                out[y, x] = _normalize_value(data[y, x], shift)
+
+    @njit(parallel=True, cache=True)
+    def _normalize_rgb_kernel(red, green, blue, red_shift, green_shift, blue_shift, out):
+        """
+        3バンドの正規化を1回の並列ループで行うNumbaカーネル（出力へ直接書き込む）
+
+        Args:
+            red, green, blue: 元のデータ配列 (1次元, UInt16)
+            red_shift, green_shift, blue_shift: 各バンドの右シフト量
+            out: 出力配列 (shape=(画素数, 3), UInt8)
+        """
+        for i in prange(out.shape[0]):
+            out[i, 0] = _normalize_value(red[i], red_shift)
+            out[i, 1] = _normalize_value(green[i], green_shift)
+            out[i, 2] = _normalize_value(blue[i], blue_shift)
+
+
+def _resize_channel(channel: np.ndarray, target_width: int, target_height: int) -> np.ndarray:
+    """
+    正規化済みのチャンネルを出力サイズに縮小
+
+    Himawariのバンド間の解像度は整数比（0.5km / 1km / 2km）のため、
+    INTER_AREAは画素の単純平均（ボックスフィルタ）となり、整数演算の高速な経路で処理される。
+
+    Args:
+        channel: チャンネルの配列 (height, width)、UInt8
+        target_width: 出力画像の幅
+        target_height: 出力画像の高さ
+
+    Returns:
+        縮小後の配列 (target_height, target_width)。サイズが同じ場合は入力をそのまま返す
+    """
+    if channel.shape == (target_height, target_width):
+        return channel
+
+    # INTER_AREAは縮小処理で最速かつ高品質
+    return cv2.resize(channel, (target_width, target_height), interpolation=cv2.INTER_AREA)
+
+
+def _normalize_resize_channel(band_data: HSData, target_width: int, target_height: int, out: np.ndarray) -> None:
+    """
+    バンドを正規化・縮小して出力チャンネルに書き込む
+
+    整数比の縮小（画素の単純平均）は行ごとに独立しているため、行方向のストリップに分割し、
+    正規化・縮小・書き込みをストリップごとに続けて行う（バンド全体の正規化結果を作らない）。
+
+    Args:
+        band_data: HSDataオブジェクト
+        target_width: 出力画像の幅
+        target_height: 出力画像の高さ
+        out: 出力先のチャンネル (target_height, target_width)、UInt8
+    """
+    if band_data.width % target_width != 0 or band_data.height % target_height != 0:
+        # 整数比でない場合はバンド全体をまとめて縮小
+        channel = normalize_band_data(band_data.data, band_data.bit_num)
+        out[...] = _resize_channel(channel, target_width, target_height)
+        return
+
+    fy = band_data.height // target_height
+    strip_rows = max(1, STRIP_BYTES // (band_data.width * band_data.data.itemsize * fy))  # 出力の行数
+    scratch = np.empty((strip_rows * fy, band_data.width), dtype=np.uint8)
+
+    for y in range(0, target_height, strip_rows):
+        src = band_data.data[y * fy:(y + strip_rows) * fy]
+        strip = normalize_band_data(src, band_data.bit_num, out=scratch[:src.shape[0]])
+        out[y:y + strip_rows] = _resize_channel(strip, target_width, src.shape[0] // fy)
+
+
+def _compose_rgb(bands: Tuple[HSData, HSData, HSData], target_width: int, target_height: int) -> np.ndarray:
+    """
+    3バンドを正規化・リサイズしてRGB画像に合成（CPU版）
+
+    Args:
+        bands: 赤・緑・青のHSDataのタプル
+        target_width: 出力画像の幅
+        target_height: 出力画像の高さ
+
+    Returns:
+        RGB画像配列 (target_height, target_width, 3)、UInt8
+    """
+    red_data, green_data, blue_data = bands
+
+    # RGB画像の出力配列を先に確保し、各チャンネルを直接書き込む（np.stackによるコピーをしない）
+    rgb_array = np.empty((target_height, target_width, 3), dtype=np.uint8)
+
+    # 各チャンネルを正規化（ビットシフトのみ、ガンマ補正なし）
+    # 必要に応じてリサイズ（OpenCVのINTER_AREAは縮小に最適化）
+    # チャンネルは2次元配列のまま扱い、1次元化・再整形のコピーをしない
+    # 3バンドとも出力サイズと同じ場合は、Numbaの並列ループ1回で3チャンネルをまとめて書き込む
+    fused = HAS_NUMBA and all(
+        band_data.width == target_width and band_data.height == target_height
+        for band_data in (red_data, green_data, blue_data)
+    )
+    if fused:
+        _normalize_rgb_kernel(
+            np.asarray(red_data.data).ravel(),
+            np.asarray(green_data.data).ravel(),
+            np.asarray(blue_data.data).ravel(),
+            max(0, red_data.bit_num - 8),
+            max(0, green_data.bit_num - 8),
+            max(0, blue_data.bit_num - 8),
+            rgb_array.reshape(-1, 3)
+        )
+
+    for name, band_data, c in (('赤', red_data, 0), ('緑', green_data, 1), ('青', blue_data, 2)):
+        if band_data.width != target_width or band_data.height != target_height:
+            print(f"{name}チャンネルをリサイズ中: {band_data.width}x{band_data.height} -> {target_width}x{target_height}")
+            _normalize_resize_channel(band_data, target_width, target_height, rgb_array[:, :, c])
+        elif not fused:
+            normalize_band_data(band_data.data, band_data.bit_num, out=rgb_array[:, :, c])
+
+    return rgb_array
+
+
+def _box_downsample_gpu(channel: 'cp.ndarray', target_width: int, target_height: int) -> 'cp.ndarray':
+    """
+    GPU上のチャンネルを整数比で縮小（画素の単純平均）
+
+    OpenCVのINTER_AREAの整数比の縮小と同じ丸めで計算する
+    （2x2は (合計+2)>>2、それ以外はfloat32で平均して最近接偶数への丸め）。
+
+    Args:
+        channel: チャンネルの配列 (height, width)、GPU上のUInt8
+        target_width: 出力画像の幅（入力の幅の約数）
+        target_height: 出力画像の高さ（入力の高さの約数）
+
+    Returns:
+        縮小後の配列 (target_height, target_width)。サイズが同じ場合は入力をそのまま返す
+    """
+    if channel.shape == (target_height, target_width):
+        return channel
+
+    fy = channel.shape[0] // target_height
+    fx = channel.shape[1] // target_width
+    total = channel.reshape(target_height, fy, target_width, fx).sum(axis=(1, 3), dtype=cp.uint32)
+    if fy == 2 and fx == 2:
+        return ((total + 2) >> 2).astype(cp.uint8)
+    return cp.rint(total.astype(cp.float32) * cp.float32(1.0 / (fy * fx))).astype(cp.uint8)
+
+
+def _compose_rgb_gpu(bands: Tuple[HSData, HSData, HSData], target_width: int, target_height: int) -> 'cp.ndarray':
+    """
+    3バンドを正規化・縮小してRGB画像に合成（GPU版）
+
+    各バンドの生データ (UInt16) を転送し、正規化・縮小・合成はGPU上で行う。
+    結果はGPU上に残し、画像補正を行う場合はそのまま補正処理に渡す。
+
+    Args:
+        bands: 赤・緑・青のHSDataのタプル（幅・高さは出力サイズの整数倍）
+        target_width: 出力画像の幅
+        target_height: 出力画像の高さ
+
+    Returns:
+        RGB画像配列 (target_height, target_width, 3)、GPU上のUInt8
+    """
+    rgb_gpu = cp.empty((target_height, target_width, 3), dtype=cp.uint8)
+    for c, band_data in enumerate(bands):
+        channel = _NORMALIZE_KERNEL_GPU(cp.asarray(band_data.data), np.int32(max(0, band_data.bit_num - 8)))
+        rgb_gpu[:, :, c] = _box_downsample_gpu(channel, target_width, target_height)
+    return rgb_gpu
+
+
 def create_rgb_composite(
     red_file: str,
     green_file: str,
@@ -52,7 +270,8 @@ def create_rgb_composite(
     gamma: float = 0.5,
     delete_dat: bool = False,
     auto_merge: bool = True,
-    enhance: bool = False
+    enhance: bool = False,
+    save_func: Optional[Callable[[np.ndarray, str], None]] = None
 ) -> Tuple[int, int]:
     """
     3つのHSDファイルからRGB合成画像を生成
@@ -66,6 +285,8 @@ def create_rgb_composite(
         delete_dat: 処理後にDATファイルを削除するか
         auto_merge: セグメントを自動結合するか (デフォルト: True)
         enhance: ImageMagick風の画像補正を適用するか (デフォルト: False)
+        save_func: 画像の保存処理 (画像配列, 出力パス) を受け取る関数。
+            指定した場合は保存をこの関数に任せる（バックグラウンド保存用、デフォルト: None）
 
     Returns:
         (width, height) のタプル
@@ -73,14 +294,32 @@ def create_rgb_composite(
     print("RGB合成を開始します...")
 
     # 各バンドのHSDファイルを読み込む（セグメント自動結合）
+    # 3バンドの読み込み（bz2解凍・ヘッダー解析）は独立しているため、スレッド並列で行う
     print(f"赤チャンネル読み込み中: {red_file}")
-    red_data = read_hsd_full(red_file, delete_dat=delete_dat, debug=False, auto_merge=auto_merge)
-
     print(f"緑チャンネル読み込み中: {green_file}")
-    green_data = read_hsd_full(green_file, delete_dat=delete_dat, debug=False, auto_merge=auto_merge)
-
     print(f"青チャンネル読み込み中: {blue_file}")
-    blue_data = read_hsd_full(blue_file, delete_dat=delete_dat, debug=False, auto_merge=auto_merge)
+
+    # 同じファイル（同じバンドの別セグメントや表記の異なるパスを含む）を複数のチャンネルに指定した場合は
+    # 1回だけ読み込む（二重の読み込みと、同じDATファイルへの同時解凍を避ける）
+    # セグメント検索のディレクトリ一覧は、読み込み前にディレクトリごとに1回だけ取得して3バンドで共有する
+    dir_names = {}
+    for band_file in (red_file, green_file, blue_file):
+        directory = os.path.dirname(band_file)
+        if directory not in dir_names:
+            dir_names[directory] = list_dir_names(directory)
+
+    band_keys = [
+        tuple(os.path.abspath(path) for path in resolve_hsd_files(
+            band_file, auto_merge=auto_merge, dir_names=dir_names[os.path.dirname(band_file)]))
+        for band_file in (red_file, green_file, blue_file)
+    ]
+    band_files = dict(zip(band_keys, (red_file, green_file, blue_file)))
+    with ThreadPoolExecutor(max_workers=len(band_files)) as executor:
+        band_data = dict(zip(band_files, executor.map(
+            lambda band_file: read_hsd_full(band_file, delete_dat=delete_dat, debug=False, auto_merge=auto_merge,
+                                            dir_names=dir_names[os.path.dirname(band_file)]),
+            band_files.values())))
+    red_data, green_data, blue_data = (band_data[key] for key in band_keys)
 
     # サイズの確認と調整
     print(f"バンド情報: R={red_data.band}({red_data.width}x{red_data.height}), "
@@ -93,39 +332,21 @@ def create_rgb_composite(
 
     print(f"出力画像サイズ: {target_width}x{target_height}")
 
-    # 各チャンネルを正規化（ビットシフトのみ、ガンマ補正なし）
-    print("データを正規化中...")
-    red_channel = normalize_band_data(red_data.data, red_data.bit_num)
-    green_channel = normalize_band_data(green_data.data, green_data.bit_num)
-    blue_channel = normalize_band_data(blue_data.data, blue_data.bit_num)
-
-    # 必要に応じてリサイズ（OpenCVのINTER_AREAは縮小に最適化）
-    if red_data.width != target_width or red_data.height != target_height:
-        print(f"赤チャンネルをリサイズ中: {red_data.width}x{red_data.height} -> {target_width}x{target_height}")
-        red_img = red_channel.reshape(red_data.height, red_data.width)
-        # INTER_AREAは縮小処理で最速かつ高品質
-        red_img = cv2.resize(red_img, (target_width, target_height), interpolation=cv2.INTER_AREA)
-        red_channel = red_img.flatten()
-
-    if green_data.width != target_width or green_data.height != target_height:
-        print(f"緑チャンネルをリサイズ中: {green_data.width}x{green_data.height} -> {target_width}x{target_height}")
-        green_img = green_channel.reshape(green_data.height, green_data.width)
-        green_img = cv2.resize(green_img, (target_width, target_height), interpolation=cv2.INTER_AREA)
-        green_channel = green_img.flatten()
-
-    if blue_data.width != target_width or blue_data.height != target_height:
-        print(f"青チャンネルをリサイズ中: {blue_data.width}x{blue_data.height} -> {target_width}x{target_height}")
-        blue_img = blue_channel.reshape(blue_data.height, blue_data.width)
-        blue_img = cv2.resize(blue_img, (target_width, target_height), interpolation=cv2.INTER_AREA)
-        blue_channel = blue_img.flatten()
-
     width = target_width
     height = target_height
 
-    # RGB画像を作成
-    print("RGB画像を合成中...")
-    rgb_array = np.stack([red_channel, green_channel, blue_channel], axis=-1)
-    rgb_array = rgb_array.reshape(height, width, 3)
+    # 各チャンネルを正規化（ビットシフトのみ、ガンマ補正なし）し、必要に応じてリサイズして合成
+    print("データを正規化中...")
+    bands = (red_data, green_data, blue_data)
+    if HAS_CUPY and all(band_data.width % width == 0 and band_data.height % height == 0 for band_data in bands):
+        # GPU版: 全バンドが出力サイズの整数倍の場合は、正規化・縮小・合成をGPU上で行う
+        rgb_array = _compose_rgb_gpu(bands, width, height)
+    else:
+        rgb_array = _compose_rgb(bands, width, height)
+
+    # 合成後は元データ (UInt16) を参照しないため、画像補正・保存の前に解放する
+    for hs_data in bands:
+        hs_data.data = None
 
     # 20251128_色調補正: ガンマ補正を適用（指数関数による明るさ調整）
     # 20251128_色調補正: gamma < 1.0 の場合、暗部が明るくなる
@@ -138,10 +359,11 @@ def create_rgb_composite(
     # 20251129_色調補正_v2: ImageMagick風の補正を適用（オプション）
     if enhance:
         print("画像補正を適用中...")
-        rgb_array = apply_imagemagick_enhance(rgb_array)
-
-    # 画像として保存
-    img = Image.fromarray(rgb_array)
+        # 保存を任せる場合、GPUからの転送完了は保存処理側で待つ
+        # GPU上で合成した配列はそのまま補正処理に渡す（再転送しない）
+        rgb_array = apply_imagemagick_enhance(rgb_array, blocking=save_func is None)
+    elif HAS_CUPY and isinstance(rgb_array, cp.ndarray):
+        rgb_array = cp.asnumpy(rgb_array)
 
     # 出力ディレクトリが存在しない場合は作成
     output_directory = os.path.dirname(output_path)
@@ -149,9 +371,17 @@ def create_rgb_composite(
         os.makedirs(output_directory, exist_ok=True)
         print(f"出力ディレクトリを作成しました: {output_directory}")
 
+    if save_func is not None:
+        save_func(rgb_array, output_path)
+        return width, height
+
+    # 画像として保存
+    img = Image.fromarray(rgb_array)
+
     # quality=90で保存速度を向上（視覚的にはquality=99とほぼ同じ）
+    # PNGはcompress_level=1で保存（デフォルトの6より圧縮率は下がるが数倍速い）
     # optimize=Trueは圧縮最適化に時間がかかるため使用しない
-    img.save(output_path, quality=90)
+    img.save(output_path, quality=90, compress_level=1)
     print(f"RGB合成画像を保存しました: {output_path}")
 
     return width, height
@@ -165,7 +395,8 @@ def create_natural_color_rgb(
     gamma: float = 0.5,
     delete_dat: bool = False,
     auto_merge: bool = True,
-    enhance: bool = False
+    enhance: bool = False,
+    save_func: Optional[Callable[[np.ndarray, str], None]] = None
 ) -> Tuple[int, int]:
     """
     Natural Color RGB合成
@@ -180,6 +411,7 @@ def create_natural_color_rgb(
         delete_dat: 処理後にDATファイルを削除するか
         auto_merge: セグメントを自動結合するか (デフォルト: True)
         enhance: ImageMagick風の画像補正を適用するか (デフォルト: False)
+        save_func: 画像の保存処理を任せる関数（create_rgb_composite を参照）
 
     Returns:
         (width, height) のタプル
@@ -195,5 +427,6 @@ def create_natural_color_rgb(
         gamma=gamma,
         delete_dat=delete_dat,
         auto_merge=auto_merge,
-        enhance=enhance
+        enhance=enhance,
+        save_func=save_func
     )
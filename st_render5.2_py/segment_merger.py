@@ -5,11 +5,17 @@ HSDファイルの複数セグメントを結合して完全な画像を生成
 import numpy as np
 import os
 import re
-from typing import List, Tuple, Optional
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import FrozenSet, List, Tuple, Optional
 from pathlib import Path
 
 from hsd_reader import hsd_read, HSData
 
+# ファイル名のセグメント番号部分 (S0110, S0210, ..., S1010)
+_SEGMENT_NUMBER_RE = re.compile(r'_S(\d{2})10')
+_SEGMENT_TOKEN_RE = re.compile(r'_S\d{4}')
+
 
 def parse_segment_number(filepath: str) -> Optional[int]:
     """
@@ -26,39 +32,65 @@ def parse_segment_number(filepath: str) -> Optional[int]:
         HS_H08_20170623_0250_B01_FLDK_R10_S1010.DAT.bz2 -> 10
     """
     # ファイル名からセグメント番号を抽出 (S0110, S0210, ..., S1010)
-    match = re.search(r'_S(\d{2})10', filepath)
+    match = _SEGMENT_NUMBER_RE.search(filepath)
     if match:
         return int(match.group(1))
     return None
 
 
-def find_all_segments(filepath: str) -> List[str]:
+def list_dir_names(directory: str) -> FrozenSet[str]:
+    """
+    ディレクトリ内のファイル名の一覧を取得
+
+    同じディレクトリに対してセグメント検索を複数回行う場合（RGB合成の3バンドなど）は、
+    呼び出し側で1回だけ取得して find_all_segments などに渡す。
+
+    Args:
+        directory: ディレクトリのパス（空文字列はカレントディレクトリ）
+
+    Returns:
+        ファイル名の集合
+    """
+    try:
+        with os.scandir(directory or '.') as entries:
+            return frozenset(entry.name for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return frozenset()
+
+
+def find_all_segments(filepath: str, dir_names: Optional[FrozenSet[str]] = None) -> List[str]:
     """
     指定されたファイルと同じ時刻・バンドの全セグメントを検索
 
     Args:
         filepath: 基準となるHSDファイルのパス
+        dir_names: filepathと同じディレクトリのファイル名一覧（list_dir_names の結果）。
+            Noneの場合はディレクトリを走査する
 
     Returns:
         全セグメントのパスのリスト（セグメント番号順）
     """
-    # ファイル名からセグメント番号部分以外を抽出
-    base_pattern = re.sub(r'_S\d{4}', '_S{:02d}10', filepath)
-
-    directory = os.path.dirname(filepath)
+    # ファイル名をセグメント番号部分 (_SNN10) の前後に分割
+    match = _SEGMENT_TOKEN_RE.search(filepath)
+    if match is None:
+        return [filepath] if os.path.exists(filepath) else []
+    prefix, suffix = filepath[:match.start()], filepath[match.end():]
+
+    # ディレクトリの一覧と照合して、セグメントごとにファイルシステムへ問い合わせない
+    names = dir_names if dir_names is not None else list_dir_names(os.path.dirname(filepath))
     segments = []
 
     # セグメント1-10を検索
     for seg_num in range(1, 11):
-        segment_path = base_pattern.format(seg_num)
+        segment_path = f"{prefix}_S{seg_num:02d}10{suffix}"
 
         # .bz2と.DATの両方をチェック
-        if os.path.exists(segment_path):
+        if os.path.basename(segment_path) in names:
             segments.append(segment_path)
         elif segment_path.endswith('.bz2'):
             # .bz2が見つからない場合、.DATをチェック
             dat_path = segment_path[:-4]  # .bz2を除去
-            if os.path.exists(dat_path):
+            if os.path.basename(dat_path) in names:
                 segments.append(dat_path)
 
     return segments
@@ -83,17 +115,19 @@ def merge_segments(segment_files: List[str], delete_dat: bool = False, debug: bo
         print(f"セグメント結合を開始します（{len(segment_files)}個のセグメント）")
 
     # 各セグメントを読み込む
-    segments_data = []
-    total_height = 0
-    width = None
-
-    for i, seg_file in enumerate(segment_files, 1):
-        if debug:
+    # セグメントごとのbz2解凍・読み込みは独立しているため、スレッド並列で行う（bz2の解凍はGILを解放する）
+    if debug:
+        for i, seg_file in enumerate(segment_files, 1):
             print(f"セグメント{i}/{len(segment_files)}を読み込み中: {os.path.basename(seg_file)}")
 
-        seg_data = hsd_read(seg_file, delete_dat=delete_dat, debug=False)
-        segments_data.append(seg_data)
+    with ThreadPoolExecutor(max_workers=len(segment_files)) as executor:
+        segments_data = list(executor.map(
+            lambda seg_file: hsd_read(seg_file, delete_dat=delete_dat, debug=False), segment_files))
 
+    total_height = 0
+    width = None
+
+    for i, seg_data in enumerate(segments_data, 1):
         # 幅の整合性チェック
         if width is None:
             width = seg_data.width
@@ -108,8 +142,22 @@ def merge_segments(segment_files: List[str], delete_dat: bool = False, debug: bo
     if debug:
         print(f"結合後の画像サイズ: {width}x{total_height}")
 
-    # データを縦に結合
-    merged_data = np.concatenate([seg.data for seg in segments_data])
+    # データを縦に結合（各セグメントは (height, width) の2次元配列）
+    # 結合後の配列を先に確保して各セグメントを順に書き込み、書き込んだセグメントはすぐに解放する
+    # 環境変数 SEGMENT_MERGE_MEMMAP=true の場合は一時ファイルのメモリマップに書き込み、
+    # 常駐メモリではなくページキャッシュとしてOSに管理させる（フルディスク3バンドのRGB合成向け）
+    shape = (total_height, width)
+    if os.getenv('SEGMENT_MERGE_MEMMAP', 'false').lower() in ('true', '1', 'yes'):
+        # 一時ファイルは作成時点で名前が消え、メモリマップの解放時に領域も解放される
+        with tempfile.TemporaryFile() as tmp:
+            merged_data = np.memmap(tmp, dtype=segments_data[0].data.dtype, mode='w+', shape=shape)
+    else:
+        merged_data = np.empty(shape, dtype=segments_data[0].data.dtype)
+    offset = 0
+    for seg in segments_data:
+        merged_data[offset:offset + seg.height] = seg.data
+        offset += seg.height
+        seg.data = None
 
     # 最初のセグメントのメタデータをベースに結合データを作成
     base_segment = segments_data[0]
@@ -139,8 +187,35 @@ def merge_segments(segment_files: List[str], delete_dat: bool = False, debug: bo
     return merged_hs_data
 
 
+def resolve_hsd_files(filepath: str, auto_merge: bool = True,
+                      dir_names: Optional[FrozenSet[str]] = None) -> List[str]:
+    """
+    read_hsd_full が読み込むファイルの一覧を取得（読み込みは行わない）
+
+    同じセグメント群を指す異なるファイル（同じバンドの別セグメントなど）を
+    呼び出し側で判別し、二重に読み込まないために使う。
+
+    Args:
+        filepath: HSDファイルのパス
+        auto_merge: 自動的にセグメントを検索・結合するか
+        dir_names: filepathと同じディレクトリのファイル名一覧（Noneの場合は走査する）
+
+    Returns:
+        読み込むファイルのパスのリスト（結合する場合はセグメント番号順）
+    """
+    if not auto_merge or parse_segment_number(filepath) is None:
+        return [filepath]
+
+    # セグメントが見つからない・1つしかない場合は指定されたファイルのみ
+    all_segments = find_all_segments(filepath, dir_names)
+    if len(all_segments) <= 1:
+        return [filepath]
+
+    return all_segments
+
+
 def read_hsd_full(filepath: str, delete_dat: bool = False, debug: bool = False,
-                  auto_merge: bool = True) -> HSData:
+                  auto_merge: bool = True, dir_names: Optional[FrozenSet[str]] = None) -> HSData:
     """
     HSDファイルを読み込み、必要に応じてセグメントを自動結合
 
@@ -149,6 +224,7 @@ def read_hsd_full(filepath: str, delete_dat: bool = False, debug: bool = False,
         delete_dat: 処理後にDATファイルを削除するか
         debug: デバッグ情報を出力するか
         auto_merge: 自動的にセグメントを検索・結合するか
+        dir_names: filepathと同じディレクトリのファイル名一覧（Noneの場合は走査する）
 
     Returns:
         HSDataオブジェクト（auto_mergeがTrueの場合は結合済み）
@@ -167,7 +243,7 @@ def read_hsd_full(filepath: str, delete_dat: bool = False, debug: bool = False,
         return hsd_read(filepath, delete_dat=delete_dat, debug=debug)
 
     # 全セグメントを検索
-    all_segments = find_all_segments(filepath)
+    all_segments = find_all_segments(filepath, dir_names)
 
     if len(all_segments) == 0:
         # セグメントが見つからない場合は単一ファイルとして処理